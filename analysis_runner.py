@@ -0,0 +1,157 @@
+"""
+Runs independent review analyses at the same time
+Every analysis gets a worker thread (SQLite, numpy and scipy release the GIL for most
+of their work). Pure-Python CPU work can be handed on to a small process pool with
+map_in_processes(), so it doesn't wait for the GIL.
+Each analysis has its own timeout: a slow one is reported, the others still finish.
+"""
+
+import contextvars
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+DEFAULT_TIMEOUT_SECONDS = 60
+PROCESS_WORKERS = 4  # at most, never more than the CPUs
+
+# Worker processes for CPU-bound analyses, started the first time one is needed
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def submit_with_context(executor, function, *args, **kwargs):
+    """
+    executor.submit() that keeps the Streamlit session and the timing spans of the caller
+    """
+    script_ctx = get_script_run_ctx() if get_script_run_ctx else None
+    context = contextvars.copy_context()
+
+    def run():
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
+        return context.run(function, *args, **kwargs)
+
+    return executor.submit(run)
+
+
+def get_process_pool():
+    """
+    Shared process pool. Processes are started with "spawn", which is safe next to
+    the Streamlit server threads (forking a threaded process is not)
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            workers = min(PROCESS_WORKERS, os.cpu_count() or 1)
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def map_in_processes(function, items):
+    """
+    [function(item) for item in items], with the items spread over the worker processes
+    The function must be defined at module level and items should be plain values (they are pickled).
+    If that doesn't work (or the pool broke), everything just runs here instead.
+    """
+    global _process_pool
+    items = list(items)
+    if (os.cpu_count() or 1) < 2 or len(items) < 2:
+        # Nothing to gain from other processes
+        return [function(item) for item in items]
+    try:
+        return list(get_process_pool().map(function, items))
+    except (pickle.PicklingError, AttributeError, TypeError, BrokenProcessPool) as e:
+        if isinstance(e, BrokenProcessPool):
+            with _process_pool_lock:
+                _process_pool = None
+        return [function(item) for item in items]
+
+
+class Analysis:
+    """
+    One analysis to run: a name, the function and its arguments
+
+    timeout: seconds to wait for the result before giving up on it
+    default: result used when the analysis fails or times out
+    """
+
+    def __init__(self, name, function, *args, timeout=DEFAULT_TIMEOUT_SECONDS, default=None, **kwargs):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.default = default
+
+    def run(self):
+        return self.function(*self.args, **self.kwargs)
+
+
+class AnalysisResults:
+    """
+    Results by analysis name, plus what went wrong and how long each one took
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.durations = {}
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+
+def run_analyses(analyses, max_workers=4):
+    """
+    Start every analysis at once and collect the results
+    Total time is close to the slowest analysis instead of the sum of all of them
+    """
+    collected = AnalysisResults()
+    if not analyses:
+        return collected
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(analyses)), thread_name_prefix="analysis")
+    started_at = time.perf_counter()
+    finished_at = {}
+
+    def run_and_time(analysis):
+        try:
+            return analysis.run()
+        finally:
+            finished_at[analysis.name] = time.perf_counter()
+
+    futures = [(analysis, submit_with_context(executor, run_and_time, analysis)) for analysis in analyses]
+    try:
+        for analysis, future in futures:
+            # Timeouts count from the start, so waiting on one analysis doesn't use up another's time
+            remaining = max(0.0, started_at + analysis.timeout - time.perf_counter())
+            try:
+                collected.results[analysis.name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                collected.results[analysis.name] = analysis.default
+                collected.errors[analysis.name] = f"timed out after {analysis.timeout}s"
+            except Exception as e:
+                collected.results[analysis.name] = analysis.default
+                collected.errors[analysis.name] = str(e)
+            if analysis.name in finished_at:
+                collected.durations[analysis.name] = round(finished_at[analysis.name] - started_at, 3)
+    finally:
+        # Don't wait for analyses that timed out - their results are no longer needed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return collected
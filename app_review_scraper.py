@@ -6,9 +6,13 @@ Gets reviews from App Store and Google Play Store
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import requests
 from bs4 import BeautifulSoup
 import json
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import gspread
 from google.oauth2.service_account import Credentials
 from textblob import TextBlob
@@ -17,6 +21,19 @@ import re
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.cluster import KMeans
 import numpy as np
+from scipy import sparse
+from review_index import parse_review_date, ReviewTimeIndex
+from http_cassette import http_get, generate_content, get_mode
+from review_timing import start_run, span, timed, register_cache_info
+from review_store import ReviewStore, review_hash
+from html_extract import ExtractionSchema, Field, first_number
+from shared_cache import SharedCache
+from page_archive import PageArchive
+from memory_budget import ByteBudgetLRU, GLOBAL_BUDGET_BYTES, all_cache_stats, session_cache
+from review_text import NO_TEXT, TOKEN_PATTERN, normalize_text, text_forms, fold_accents, portuguese_stopwords, stem
+from review_sampling import DEFAULT_TOKEN_BUDGET, estimate_tokens, sample_reviews
+from analysis_runner import Analysis, run_analyses, map_in_processes, submit_with_context, PROCESS_WORKERS
+from streaming_analysis import HeavyHitters, StreamingReviewStats
 try:
     import google.generativeai as genai
     GEMINI_AVAILABLE = True
@@ -24,220 +41,487 @@ except ImportError:
     GEMINI_AVAILABLE = False
     print("⚠️ Warning: google.generativeai not available. Gemini AI features will be disabled.")
 
-def get_app_store_reviews():
+try:
+    from wordcloud import WordCloud
+    WORDCLOUD_AVAILABLE = True
+except ImportError:
+    WORDCLOUD_AVAILABLE = False
+
+register_cache_info("parse_review_date", parse_review_date.cache_info)
+register_cache_info("stem", stem.cache_info)
+
+# Apps and Play Store locales to collect - override with [[review_targets]] in secrets.toml
+DEFAULT_REVIEW_TARGETS = [
+    {"app_id": "pt.viaverde.clientes", "locale": "pt_PT", "label": "Via Verde"}
+]
+
+# How many pages are downloaded at the same time - in total, over every app, store and session
+MAX_PARALLEL_FETCHES = 4
+_fetch_slots = threading.BoundedSemaphore(MAX_PARALLEL_FETCHES)
+
+# How long downloaded pages and analysis results stay fresh in the shared cache
+PAGE_CACHE_SECONDS = 15 * 60
+ANALYSIS_CACHE_SECONDS = 24 * 60 * 60
+
+# A snapshot older than this is refreshed in the background when the dashboard opens
+SNAPSHOT_REFRESH_SECONDS = PAGE_CACHE_SECONDS
+
+# Background refresh threads of this process, one per set of apps
+_background_refreshes = {}
+_background_lock = threading.Lock()
+
+# Apple's public customer reviews feed (newest first, 50 reviews per page, 10 pages at most)
+APP_STORE_FEED_URL = "https://itunes.apple.com/{country}/rss/customerreviews/page={page}/id={app_id}/sortby=mostrecent/json"
+APP_STORE_MAX_PAGES = 10
+APP_STORE_PAGE_SIZE = 50
+
+# TextBlob scoring is sent to the worker processes in chunks of texts: at most SENTIMENT_CHUNK_SIZE,
+# and at least SENTIMENT_MIN_CHUNK_SIZE (smaller chunks cost more to send than to score)
+SENTIMENT_CHUNK_SIZE = 500
+SENTIMENT_MIN_CHUNK_SIZE = 50
+
+# Reviews read from the store at a time when the whole history is analyzed
+HISTORY_CHUNK_SIZE = 2000
+# Word forms remembered during that pass (to show keywords as people wrote them)
+HISTORY_WORD_FORMS = 5000
+DAILY_ROLLUPS_VERSION = 2  # bump to recompute the stored per-day totals
+HISTORY_KEYWORDS_VERSION = 2  # bump when KeywordAnalyzer changes, to recount the history keywords
+
+# Reviews are parsed and shown in batches of this size, so the first ones appear right away
+REVIEW_BATCH_SIZE = 25
+
+@st.cache_resource
+def get_shared_cache():
     """
-    Apple Store reviews - ON HOLD
-    Returns empty list for now
+    Cache shared by every dashboard process on this machine (see shared_cache.py)
     """
-    return []
+    return SharedCache()
 
-def get_google_play_reviews():
+@st.cache_resource
+def get_snapshot_memory():
     """
-    Get all visible reviews from Google Play Store for Via Verde (Portuguese page)
-    Focus on extracting all visible reviews while preserving original language
+    Snapshots already read from the review store, shared by all sessions within a byte budget
+    """
+    return ByteBudgetLRU("snapshots", GLOBAL_BUDGET_BYTES)
+
+@st.cache_resource
+def get_page_archive():
+    """
+    Compressed archive of every downloaded page (see page_archive.py)
+    """
+    return PageArchive()
+
+def limited_http_get(url, **kwargs):
+    """
+    http_get once a download slot is free: the fetch thread pools are nested (apps, then
+    pages of each app), so the limit is kept here rather than by the size of each pool
+    """
+    with _fetch_slots:
+        return http_get(url, **kwargs)
+
+def fetch_page(url, headers):
+    """
+    Download a page through the shared cache - only one process downloads it when it goes stale
+    Returns the page content; raises when the store doesn't answer with 200
+    """
+    def download():
+        response = limited_http_get(url, headers=headers, timeout=15)
+        if response.status_code != 200:
+            raise RuntimeError(f"status: {response.status_code}")
+        # Keep the raw page so it can be parsed again later (see backfill_reviews.py)
+        try:
+            get_page_archive().put(response.content, url)
+        except Exception as e:
+            print(f"⚠️ Could not archive {url}: {e}")
+        return response.content
+    
+    return get_shared_cache().get_or_compute(f"page:{url}", download, ttl=PAGE_CACHE_SECONDS)
+
+def get_review_targets():
+    """
+    List of (app id, locale) targets from secrets.toml, or the Via Verde default
+    """
+    try:
+        targets = [dict(target) for target in st.secrets["review_targets"]]
+    except (KeyError, FileNotFoundError, TypeError):
+        return DEFAULT_REVIEW_TARGETS
+    
+    for target in targets:
+        target.setdefault("locale", "pt_PT")
+        target.setdefault("label", f"{target['app_id']} ({target['locale']})")
+    return targets or DEFAULT_REVIEW_TARGETS
+
+def run_in_threads(function, items, max_workers=MAX_PARALLEL_FETCHES):
+    """
+    Call function(item) for every item on a small thread pool and return results in order
+    Worker threads keep the Streamlit session (so st.info etc. still show up)
+    and the timing spans of the caller
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [submit_with_context(executor, function, item) for item in items]
+        return [future.result() for future in futures]
+
+def collect_app_store_reviews(targets, stored_reviews=None, max_workers=MAX_PARALLEL_FETCHES):
+    """
+    Get App Store reviews for every target that has an `app_store_id`, at the same time
+    Reviews we already have (`stored_reviews`) are kept, and only newer ones are fetched
+    Each app keeps at most the reviews the feed itself can show (the newest 500): older ones
+    are still in the review store, so the snapshot doesn't grow with every refresh
+    """
+    stored_reviews = stored_reviews or []
+    ios_targets = [target for target in targets if target.get("app_store_id")]
+    
+    def fetch_target(target):
+        old_reviews = [r for r in stored_reviews if r.get("app_id") == target["app_store_id"]]
+        new_reviews = get_app_store_reviews(
+            target["app_store_id"],
+            target.get("country", "pt"),
+            target.get("label"),
+            known_ids={r["review_id"] for r in old_reviews}
+        )
+        return (new_reviews + old_reviews)[:APP_STORE_MAX_PAGES * APP_STORE_PAGE_SIZE]
+    
+    results = run_in_threads(fetch_target, ios_targets, max_workers)
+    return [review for reviews in results for review in reviews]
+
+def get_app_store_reviews(app_id, country="pt", label=None, known_ids=None, max_pages=APP_STORE_MAX_PAGES, feed_url=None):
+    """
+    Get reviews from Apple's customer reviews feed (newest first)
+    Pages are downloaded a few at a time, and we stop as soon as we reach a review
+    we already have (its id is in `known_ids`)
+    When a page fails, the reviews of the pages before it are kept and we stop there
+    `feed_url` can point at a local server with recorded pages for testing
+    """
+    label = label or f"{app_id} ({country})"
+    known_ids = set(known_ids or [])
+    feed_url = feed_url or os.environ.get("REVIEW_APP_STORE_FEED_URL", APP_STORE_FEED_URL)
+    
+    def fetch_page(page):
+        """
+        (reviews, None) or ([], error) - one failed page doesn't cost the others of its wave
+        """
+        url = feed_url.format(country=country, page=page, app_id=app_id)
+        try:
+            with span("fetch app store page"):
+                response = limited_http_get(url, headers={'Accept': 'application/json'}, timeout=15)
+            if response.status_code != 200:
+                raise RuntimeError(f"status {response.status_code}")
+            return parse_app_store_feed(response.json(), app_id, country, label), None
+        except Exception as e:
+            return [], e
+    
+    reviews_list = []
+    # Download pages in waves of MAX_PARALLEL_FETCHES, checking after each wave if we can stop
+    for first_page in range(1, max_pages + 1, MAX_PARALLEL_FETCHES):
+        pages = range(first_page, min(first_page + MAX_PARALLEL_FETCHES, max_pages + 1))
+        for page, (page_reviews, error) in zip(pages, run_in_threads(fetch_page, pages)):
+            if error is not None:
+                # Pages after this one are not kept either: the gap could never be filled,
+                # since the next refresh stops at the first review it already has
+                st.error(f"Could not get App Store reviews for {label} (page {page}): {error}")
+                return reviews_list
+            if not page_reviews:
+                # Empty page means we went past the last review
+                return reviews_list
+            for review in page_reviews:
+                if review["review_id"] in known_ids:
+                    # Everything from here on is already stored
+                    return reviews_list
+                reviews_list.append(review)
+    return reviews_list
+
+def parse_app_store_feed(feed_json, app_id, country, label):
+    """
+    Turn one page of Apple's JSON feed into review dicts shaped like the Android ones
+    """
+    entries = feed_json.get("feed", {}).get("entry", [])
+    if isinstance(entries, dict):
+        # A page with a single entry is not wrapped in a list
+        entries = [entries]
+    
+    reviews_list = []
+    for entry in entries:
+        # The first entry of older feeds describes the app itself and has no rating
+        if "im:rating" not in entry:
+            continue
+        
+        title = entry.get("title", {}).get("label", "")
+        text = entry.get("content", {}).get("label", "").strip()
+        if title and text and title.strip() != text:
+            text = f"{title}. {text}"
+        
+        updated = entry.get("updated", {}).get("label", "")
+        parsed_date = parse_review_date(updated[:10])
+        
+        reviews_list.append({
+            "rating": int(entry["im:rating"].get("label", 0)),
+            "review": text or title or NO_TEXT,
+            "date": parsed_date.isoformat() if parsed_date else "Recent",
+            "date_iso": parsed_date.isoformat() if parsed_date else None,
+            "os": "iOS",
+            "reviewer_name": entry.get("author", {}).get("name", {}).get("label", "Unknown"),
+            "useful_count": int(entry.get("im:voteCount", {}).get("label", 0) or 0),
+            "review_id": entry.get("id", {}).get("label", ""),
+            "app_version": entry.get("im:version", {}).get("label", ""),
+            "app_id": app_id,
+            "locale": country,
+            "source": label
+        })
+    
+    return reviews_list
+
+def fetch_google_play_page(app_id, locale):
+    """
+    Download the Play Store page of one app in one locale (through the shared cache)
     """
+    # Google Play Store URL - the Portuguese page gives better review access for Via Verde
+    url = f"https://play.google.com/store/apps/details?id={app_id}&hl={locale}"
+    
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': f"{locale.replace('_', '-')},en-US;q=0.5",
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1'
+    }
+    
+    with span("fetch"):
+        return fetch_page(url, headers)
+
+def stream_google_play_reviews(app_id="pt.viaverde.clientes", locale="pt_PT", label=None,
+                               batch_size=REVIEW_BATCH_SIZE, fetch=None):
+    """
+    Yield the Google Play reviews of one app in batches, as soon as each batch is parsed
+    fetch: function returning the page content (by default the page is downloaded here)
+    """
+    label = label or f"{app_id} ({locale})"
     try:
-        # Google Play Store URL for Via Verde - Portuguese page for better review access
-        url = "https://play.google.com/store/apps/details?id=pt.viaverde.clientes&hl=pt_PT"
+        page_content = fetch() if fetch else fetch_google_play_page(app_id, locale)
+        if not page_content:
+            st.error(f"Could not access Google Play Store for {label} (empty page)")
+            return
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
+        # Same page content (and parser) means same reviews, so a page parsed by any process is reused
+        cache = get_shared_cache()
+        parsed_key = f"parsed:v{PLAY_STORE_PARSER_VERSION}:{hashlib.sha1(page_content).hexdigest()}"
+        cached_reviews = cache.get(parsed_key)
+        if cached_reviews is not None:
+            batches = (cached_reviews[start:start + batch_size] for start in range(0, len(cached_reviews), batch_size))
+        else:
+            batches = iter_google_play_reviews(page_content, batch_size)
+        
+        reviews_list = []
+        for batch in batches:
+            # Tag every review with where it came from
+            for review in batch:
+                review["app_id"] = app_id
+                review["locale"] = locale
+                review["source"] = label
+            reviews_list.extend(batch)
+            yield batch
         
-        response = requests.get(url, headers=headers, timeout=15)
+        if cached_reviews is None:
+            cache.set(parsed_key, reviews_list, ttl=ANALYSIS_CACHE_SECONDS)
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            reviews_list = []
+        if reviews_list:
+            st.success(f"Successfully extracted {len(reviews_list)} Android reviews for {label}")
+        else:
+            st.warning(f"No reviews found in the HTML structure for {label}")
+    
+    except Exception as e:
+        st.error(f"Could not get Google Play reviews for {label}: {str(e)}")
+
+def get_google_play_reviews(app_id="pt.viaverde.clientes", locale="pt_PT", label=None):
+    """
+    Get all visible reviews from Google Play Store for one app in one locale
+    (defaults to Via Verde on the Portuguese page)
+    Focus on extracting all visible reviews while preserving original language
+    """
+    return [review for batch in stream_google_play_reviews(app_id, locale, label) for review in batch]
+
+def longest_review_like_text(container):
+    """
+    Fallback for the review text: the longest child text that doesn't look like page navigation
+    """
+    all_text = container.get_text(strip=True)
+    child_text_elements = container.find_all(['span', 'div', 'p'])
+    
+    potential_texts = []
+    for child in child_text_elements:
+        child_text = child.get_text(strip=True)
+        if child_text and len(child_text) > 10:
+            potential_texts.append(child_text)
+    
+    if potential_texts:
+        # Filter texts that look like reviews
+        review_like_texts = []
+        for text in potential_texts:
+            if (len(text) > 20 and 
+                not any(skip_word in text.lower() for skip_word in ['sign in', 'library', 'payments', 'settings', 'privacy', 'terms', 'search', 'help', 'download', 'install', 'update', 'version', 'android', 'ios'])):
+                review_like_texts.append(text)
+        
+        if review_like_texts:
+            return max(review_like_texts, key=len)
+        return max(potential_texts, key=len)
+    
+    return all_text if len(all_text) > 10 else None
+
+def useful_votes(useful_text):
+    """
+    "Essa avaliação foi marcada como útil por 118 pessoas" (or the English version) -> 118
+    """
+    if 'pessoas' in useful_text or 'people' in useful_text:
+        return first_number(useful_text)
+    return None
+
+# What a Play Store review looks like, using the selectors found by inspecting the page
+# Part of the cache key of parsed pages: bump it when the schema or the parsing changes,
+# so pages parsed by the old version are parsed again instead of served from the cache
+PLAY_STORE_PARSER_VERSION = 2
+
+PLAY_STORE_REVIEW_SCHEMA = ExtractionSchema(
+    containers=[
+        'div.EGFGHd',  # Main review container
+        'div[data-testid="review-item"]',  # Fallback
+        'div[jsname="gWDdlc"]',  # Fallback
+        'div[jsname="yEVEwb"]',  # Fallback
+        'div.h3YV2d'  # Last fallback - just text containers
+    ],
+    fields={
+        # Rating lives in the aria-label of the stars inside the div.Jx4nYe header
+        "rating": Field(
+            'div.Jx4nYe :is(div, span)[aria-label*="estrelas" i], div.Jx4nYe :is(div, span)[aria-label*="stars" i]',
+            attr='aria-label', process=first_number, default=5, every_match=True  # skip labels without a number
+        ),
+        "review": Field('div.h3YV2d', fallback=longest_review_like_text, default=NO_TEXT),
+        "date": Field('div.Jx4nYe span.bp9Aid', default="Recent"),
+        "reviewer_name": Field('div.X5PpBb', default="Unknown"),
+        "useful_count": Field('div.AJTPZc', process=useful_votes, default=0)
+    }
+)
+
+def find_review_containers(soup):
+    """
+    The elements of a parsed Play Store page that hold one review each
+    """
+    # Try the container selectors of the schema in one pass over the page
+    container_match = PLAY_STORE_REVIEW_SCHEMA.find_containers(soup)
+    review_containers = container_match.containers
+    if container_match:
+        st.info(f"Found {len(review_containers)} review elements (selector: {container_match.selector})")
+    
+    # If no reviews found with selectors, try a more targeted approach
+    if not review_containers:
+        st.info("No reviews found with standard selectors. Trying alternative approach...")
+        
+        # Look for elements that might contain reviews, but be more selective
+        all_divs = soup.find_all('div')
+        for div in all_divs:
+            text = div.get_text(strip=True)
+            text_lower = text.lower()
             
-            # Use the exact selectors found by inspecting the page
-            # Target the main review containers
-            review_selectors = [
-                'div.EGFGHd',  # Main review container
-                'div[data-testid="review-item"]',  # Fallback
-                'div[jsname="gWDdlc"]',  # Fallback
-                'div[jsname="yEVEwb"]',  # Fallback
-                'div.h3YV2d'  # Last fallback - just text containers
+            # Skip navigation/header elements and privacy policy text
+            skip_words = [
+                'sign in with google', 'library & devices', 'payments & subscriptions', 'play pass', 'settings', 
+                'privacy policy', 'terms of service', 'search', 'help_outline', 'no data shared with third parties',
+                'learn more about how developers declare sharing', 'this app may collect these data types',
+                'location, personal info and 4 others', 'data is encrypted in transit', 'see details',
+                'flag inappropriate', 'show review history', 'more_vert', 'learn more'
             ]
             
-            review_containers = []
-            for selector in review_selectors:
-                containers = soup.select(selector)
-                if containers:
-                    review_containers = containers
-                    st.info(f"Found {len(containers)} review elements")
-                    break
-            
-            # If no reviews found with selectors, try a more targeted approach
-            if not review_containers:
-                st.info("No reviews found with standard selectors. Trying alternative approach...")
-                
-                # Look for elements that might contain reviews, but be more selective
-                all_divs = soup.find_all('div')
-                for div in all_divs:
-                    text = div.get_text(strip=True)
-                    
-                    # Skip navigation/header elements and privacy policy text
-                    skip_words = [
-                        'sign in with google', 'library & devices', 'payments & subscriptions', 'play pass', 'settings', 
-                        'privacy policy', 'terms of service', 'search', 'help_outline', 'no data shared with third parties',
-                        'learn more about how developers declare sharing', 'this app may collect these data types',
-                        'location, personal info and 4 others', 'data is encrypted in transit', 'see details',
-                        'flag inappropriate', 'show review history', 'more_vert', 'learn more'
-                    ]
-                    
-                    if any(skip_word in text.lower() for skip_word in skip_words):
-                        continue
-                    
-                    # Look for elements that contain actual user review text
-                    if (len(text) > 30 and len(text) < 400 and  # Reasonable length for a review
-                        any(word in text.lower() for word in ['works', 'good', 'bad', 'bom', 'mau', 'funciona', 'time', 'problem', 'issue', 'bug', 'crash', 'stable', 'unstable', 'frustrating', 'excellent', 'terrible', 'recommend', 'app', 'application', 'erro', 'erros', 'problema', 'problemas', 'funcional', 'não', 'sim', 'ótimo', 'péssimo', 'recomendo']) and
-                        not any(skip_word in text.lower() for skip_word in ['google play', 'download', 'install', 'update', 'version', 'android', 'ios', 'device', 'data types', 'encrypted', 'transit', 'privacy', 'policy', 'terms', 'service']) and
-                        # Must contain personal opinion words
-                        any(opinion_word in text.lower() for opinion_word in ['i', 'my', 'me', 'we', 'us', 'this', 'that', 'it', 'app', 'application'])):
-                        review_containers.append(div)
-                        # Limit to avoid too many false positives
-                        if len(review_containers) >= 10:
-                            break
+            if any(skip_word in text_lower for skip_word in skip_words):
+                continue
             
-            # Process all visible reviews (no limit)
-            for i, container in enumerate(review_containers):
+            # Look for elements that contain actual user review text
+            if (len(text) > 30 and len(text) < 400 and  # Reasonable length for a review
+                any(word in text_lower for word in ['works', 'good', 'bad', 'bom', 'mau', 'funciona', 'time', 'problem', 'issue', 'bug', 'crash', 'stable', 'unstable', 'frustrating', 'excellent', 'terrible', 'recommend', 'app', 'application', 'erro', 'erros', 'problema', 'problemas', 'funcional', 'não', 'sim', 'ótimo', 'péssimo', 'recomendo']) and
+                not any(skip_word in text_lower for skip_word in ['google play', 'download', 'install', 'update', 'version', 'android', 'ios', 'device', 'data types', 'encrypted', 'transit', 'privacy', 'policy', 'terms', 'service']) and
+                # Must contain personal opinion words
+                any(opinion_word in text_lower for opinion_word in ['i', 'my', 'me', 'we', 'us', 'this', 'that', 'it', 'app', 'application'])):
+                review_containers.append(div)
+                # Limit to avoid too many false positives
+                if len(review_containers) >= 10:
+                    break
+    
+    return review_containers
+
+def parse_review_container(container):
+    """
+    Read one review from its container, or None when it doesn't look like a real review
+    """
+    # Read rating, text, date, name and useful count with the compiled schema
+    fields = PLAY_STORE_REVIEW_SCHEMA.extract_fields(container)
+    rating = fields["rating"]
+    review_text = fields["review"]
+    date_text = fields["date"]
+    reviewer_name = fields["reviewer_name"]
+    useful_count = fields["useful_count"]
+
+    # Validate that this looks like a real review, not navigation or privacy text
+    skip_words = [
+        'sign in with google', 'library & devices', 'payments & subscriptions', 'play pass', 'settings', 
+        'privacy policy', 'terms of service', 'search', 'help_outline', 'no data shared with third parties',
+        'learn more about how developers declare sharing', 'this app may collect these data types',
+        'location, personal info and 4 others', 'data is encrypted in transit', 'see details',
+        'flag inappropriate', 'show review history', 'more_vert', 'learn more', 'lucas dias'
+    ]
+
+    # Normalize the text once - the analyses reuse these forms later
+    forms = normalize_text(review_text)
+
+    # More lenient validation - just check basic requirements
+    if (forms["has_text"] and 
+        len(review_text) > 10 and 
+        len(review_text) < 500 and
+        not any(skip_word in forms["lower"] for skip_word in skip_words)):
+
+        parsed_date = parse_review_date(date_text)
+        return {
+            "rating": rating,
+            "review": review_text,
+            "date": date_text,
+            "date_iso": parsed_date.isoformat() if parsed_date else None,
+            "os": "Android",
+            "reviewer_name": reviewer_name,
+            "useful_count": useful_count,
+            "text_forms": forms
+        }
+    return None
+
+def iter_google_play_reviews(html, batch_size=REVIEW_BATCH_SIZE):
+    """
+    Parse a Google Play Store page and yield its reviews in small batches, as soon as each batch is ready
+    Lets the dashboard show the first reviews without waiting for the whole page
+    """
+    with span("parse"):
+        soup = BeautifulSoup(html, 'html.parser')
+        review_containers = find_review_containers(soup)
+    
+    # Process all visible reviews (no limit), one batch of containers at a time
+    for start in range(0, len(review_containers), batch_size):
+        batch = []
+        with span("parse"):
+            for container in review_containers[start:start + batch_size]:
                 try:
-                    # Extract rating and date from the specific header selector
-                    rating = 5  # Default rating
-                    
-                    # Look for rating in the div.Jx4nYe element
-                    rating_div = container.select_one('div.Jx4nYe')
-                    if rating_div:
-                        # Look for aria-label with rating information
-                        rating_elements = rating_div.find_all(['div', 'span'], attrs={'aria-label': True})
-                        
-                        for rating_elem in rating_elements:
-                            aria_label = rating_elem.get('aria-label', '')
-                            if 'estrelas' in aria_label.lower() or 'stars' in aria_label.lower():
-                                import re
-                                numbers = re.findall(r'\d+', aria_label)
-                                if numbers:
-                                    rating = int(numbers[0])
-                                    break
-                    
-                    # Extract review text
-                    review_text = "Review text not available"
-                    
-                    # Look for the review text within the parent container
-                    # First try to find div.h3YV2d within this container
-                    text_container = container.select_one('div.h3YV2d')
-                    if text_container:
-                        review_text = text_container.get_text(strip=True)
-                    else:
-                        # Fallback: look for the longest meaningful text
-                        all_text = container.get_text(strip=True)
-                        child_text_elements = container.find_all(['span', 'div', 'p'])
-                        
-                        potential_texts = []
-                        for child in child_text_elements:
-                            child_text = child.get_text(strip=True)
-                            if child_text and len(child_text) > 10:
-                                potential_texts.append(child_text)
-                        
-                        if potential_texts:
-                            # Filter texts that look like reviews
-                            review_like_texts = []
-                            for text in potential_texts:
-                                if (len(text) > 20 and 
-                                    not any(skip_word in text.lower() for skip_word in ['sign in', 'library', 'payments', 'settings', 'privacy', 'terms', 'search', 'help', 'download', 'install', 'update', 'version', 'android', 'ios'])):
-                                    review_like_texts.append(text)
-                            
-                            if review_like_texts:
-                                review_text = max(review_like_texts, key=len)
-                            else:
-                                review_text = max(potential_texts, key=len)
-                        else:
-                            review_text = all_text if len(all_text) > 10 else "Review text not available"
-                    
-                    # Extract date from span.bp9Aid
-                    date_text = "Recent"
-                    
-                    if rating_div:
-                        date_span = rating_div.select_one('span.bp9Aid')
-                        if date_span:
-                            date_text = date_span.get_text(strip=True)
-                    
-                    # Extract reviewer name from div.X5PpBb
-                    reviewer_name = "Unknown"
-                    
-                    name_div = container.select_one('div.X5PpBb')
-                    if name_div:
-                        reviewer_name = name_div.get_text(strip=True)
-                    
-                    # Extract useful count from div.AJTPZc
-                    useful_count = 0
-                    
-                    useful_div = container.select_one('div.AJTPZc')
-                    if useful_div:
-                        useful_text = useful_div.get_text(strip=True)
-                        
-                        # Look for Portuguese pattern: "Essa avaliação foi marcada como útil por 118 pessoas"
-                        if 'pessoas' in useful_text:
-                            import re
-                            numbers = re.findall(r'\d+', useful_text)
-                            if numbers:
-                                useful_count = int(numbers[0])
-                        # Also look for English patterns
-                        elif 'people' in useful_text:
-                            import re
-                            numbers = re.findall(r'\d+', useful_text)
-                            if numbers:
-                                useful_count = int(numbers[0])
-                    
-                    # Validate that this looks like a real review, not navigation or privacy text
-                    skip_words = [
-                        'sign in with google', 'library & devices', 'payments & subscriptions', 'play pass', 'settings', 
-                        'privacy policy', 'terms of service', 'search', 'help_outline', 'no data shared with third parties',
-                        'learn more about how developers declare sharing', 'this app may collect these data types',
-                        'location, personal info and 4 others', 'data is encrypted in transit', 'see details',
-                        'flag inappropriate', 'show review history', 'more_vert', 'learn more', 'lucas dias'
-                    ]
-                    
-                    # More lenient validation - just check basic requirements
-                    if (review_text != "Review text not available" and 
-                        len(review_text) > 10 and 
-                        len(review_text) < 500 and
-                        not any(skip_word in review_text.lower() for skip_word in skip_words)):
-                        
-                        # Add review
-                        reviews_list.append({
-                            "rating": rating,
-                            "review": review_text,
-                            "date": date_text,
-                            "os": "Android",
-                            "reviewer_name": reviewer_name,
-                            "useful_count": useful_count
-                        })
-                    
+                    review = parse_review_container(container)
                 except Exception as e:
                     continue
-            
-            # If we found reviews, return them
-            if reviews_list:
-                st.success(f"Successfully extracted {len(reviews_list)} Android reviews")
-                return reviews_list
-            else:
-                st.warning("No reviews found in the HTML structure")
-                return []
-        else:
-            st.error(f"Could not access Google Play Store (status: {response.status_code})")
-            return []
-    
-    except Exception as e:
-        st.error(f"Could not get Google Play reviews: {str(e)}")
-        return []
+                if review:
+                    batch.append(review)
+        if batch:
+            yield batch
+
+def parse_google_play_reviews(html):
+    """
+    Extract reviews from a Google Play Store page (HTML text or bytes)
+    Kept apart from the download so saved pages can be parsed and benchmarked offline
+    """
+    return [review for batch in iter_google_play_reviews(html) for review in batch]
 
 def save_to_google_sheets(reviews, sheet_url=None, credentials_json=None):
     """
@@ -325,70 +609,166 @@ def save_to_google_sheets(reviews, sheet_url=None, credentials_json=None):
         st.error(f"❌ Error saving to Google Sheets: {str(e)}")
         return False
 
+@timed("sentiment (TextBlob)")
 def analyze_sentiment(reviews):
     """
     Analyze sentiment of reviews using TextBlob
     """
-    sentiments = []
-    for review in reviews:
-        text = review.get('review', '')
-        if text and text != "Review text not available":
-            blob = TextBlob(text)
-            polarity = blob.sentiment.polarity  # -1 to 1
-            subjectivity = blob.sentiment.subjectivity  # 0 to 1
-            
-            # Determine emotional tone
-            if polarity < -0.5:
-                tone = "Very Negative/Angry"
-            elif polarity < -0.1:
-                tone = "Negative/Frustrated"
-            elif polarity < 0.1:
-                tone = "Neutral"
-            elif polarity < 0.5:
-                tone = "Positive/Satisfied"
-            else:
-                tone = "Very Positive/Happy"
-            
-            sentiments.append({
-                'reviewer_name': review.get('reviewer_name', 'Unknown'),
-                'rating': review.get('rating', 0),
-                'polarity': polarity,
-                'subjectivity': subjectivity,
-                'tone': tone,
-                'review_text': text[:100] + "..." if len(text) > 100 else text
-            })
+    return [sentiment for sentiment in review_sentiments(reviews) if sentiment]
+
+def review_sentiments(reviews):
+    """
+    TextBlob sentiment for each review, in order (None where there is no text)
+    """
+    texts = [text_forms(review)["nfc"] for review in reviews if text_forms(review)["has_text"]]
+    scores = iter(textblob_scores_in_processes(texts))
+    return [review_sentiment(review, next(scores)) if text_forms(review)["has_text"] else None for review in reviews]
+
+def textblob_scores_in_processes(texts):
+    """
+    textblob_scores(texts), spread over the worker processes in chunks
+    TextBlob is pure Python and holds the GIL, so threads wouldn't score in parallel
+    (map_in_processes runs everything here when there is a single chunk or a single CPU)
+    """
+    chunk_size = min(SENTIMENT_CHUNK_SIZE, max(SENTIMENT_MIN_CHUNK_SIZE, -(-len(texts) // PROCESS_WORKERS)))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    return [score for chunk_scores in map_in_processes(textblob_scores, chunks) for score in chunk_scores]
+
+def textblob_scores(texts):
+    """
+    (polarity, subjectivity) for each text - only plain values go in and out, so it can run in another process
+    """
+    scores = []
+    for text in texts:
+        sentiment = TextBlob(text).sentiment
+        scores.append((sentiment.polarity, sentiment.subjectivity))
+    return scores
+
+def review_sentiment(review, scores=None):
+    """
+    TextBlob sentiment for a single review (None when there is no text)
+    scores: (polarity, subjectivity) if TextBlob already ran for this review
+    """
+    forms = text_forms(review)
+    if not forms["has_text"]:
+        return None
+    
+    text = forms["nfc"]
+    polarity, subjectivity = scores or textblob_scores([text])[0]  # -1 to 1, 0 to 1
+    
+    # Determine emotional tone
+    if polarity < -0.5:
+        tone = "Very Negative/Angry"
+    elif polarity < -0.1:
+        tone = "Negative/Frustrated"
+    elif polarity < 0.1:
+        tone = "Neutral"
+    elif polarity < 0.5:
+        tone = "Positive/Satisfied"
+    else:
+        tone = "Very Positive/Happy"
+    
+    return {
+        'reviewer_name': review.get('reviewer_name', 'Unknown'),
+        'rating': review.get('rating', 0),
+        'polarity': polarity,
+        'subjectivity': subjectivity,
+        'tone': tone,
+        'review_text': text[:100] + "..." if len(text) > 100 else text
+    }
+
+def keyword_terms(tokens, ngram_range=(1, 3)):
+    """
+    Words and 2-3 word phrases from a review's normalized tokens
+    """
+    terms = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return terms
+
+class KeywordAnalyzer:
+    """
+    TF-IDF analyzer: 1-3 word phrases of stemmed words
+    Stopwords are left out and phrases don't run across them, so "pagar as portagens"
+    gives "pagar" and "portagens" but no "pagar as" or "as portagens"
+    Words with the same stem count as one ("funciona", "funcionou") and are shown
+    as the form people wrote most often
+    """
     
-    return sentiments
+    def __init__(self, ngram_range=(1, 3), max_words=None):
+        """
+        max_words: keep at most this many word forms in memory (approximate counts),
+        for passes over more reviews than fit in memory
+        """
+        self.ngram_range = ngram_range
+        self.stopwords = portuguese_stopwords()
+        self.word_counts = {}  # stem -> {word: count}
+        self.word_sketch = HeavyHitters(max_words) if max_words else None  # (stem, word) -> count
+    
+    def __call__(self, tokens):
+        terms = []
+        phrase = []
+        for token in tokens + [None]:
+            if token is not None and token not in self.stopwords:
+                stemmed = stem(token)
+                if self.word_sketch is not None:
+                    self.word_sketch.add((stemmed, token))
+                else:
+                    counts = self.word_counts.setdefault(stemmed, {})
+                    counts[token] = counts.get(token, 0) + 1
+                phrase.append(stemmed)
+                continue
+            # A stopword (or the end of the review) closes the current phrase
+            if phrase:
+                terms.extend(keyword_terms(phrase, self.ngram_range))
+                phrase = []
+        return terms
+    
+    def original(self, term):
+        """
+        A stemmed term written with the most common form of each word
+        """
+        words = []
+        for stemmed in term.split(" "):
+            if self.word_sketch is not None:
+                counts = {word: count for (word_stem, word), count in self.word_sketch.counters.items() if word_stem == stemmed}
+            else:
+                counts = self.word_counts.get(stemmed)
+            words.append(max(counts, key=counts.get) if counts else stemmed)
+        return " ".join(words)
 
+@timed("keywords (TF-IDF)")
 def extract_keywords(reviews, top_n=20):
     """
     Extract common keywords and phrases from reviews
     """
-    # Combine all review texts
-    all_text = []
+    # Words of every review, already split by the normalization step
+    all_tokens = []
     for review in reviews:
-        text = review.get('review', '')
-        if text and text != "Review text not available":
-            all_text.append(text)
+        forms = text_forms(review)
+        if forms["has_text"]:
+            all_tokens.append(forms["tokens"])
     
-    if not all_text:
+    if not all_tokens:
         return {}
     
     # Use TF-IDF to find important keywords
+    # The analyzer builds 1-3 word phrases from the ready-made tokens instead of re-splitting the text,
+    # leaving out stopwords and grouping words with the same stem
+    analyzer = KeywordAnalyzer()
     vectorizer = TfidfVectorizer(
         max_features=top_n,
-        stop_words=None,  # We'll handle Portuguese manually
-        ngram_range=(1, 3),  # Include 1-3 word phrases
+        analyzer=analyzer,
         min_df=1  # Word must appear in at least 1 review
     )
     
     try:
-        tfidf_matrix = vectorizer.fit_transform(all_text)
+        tfidf_matrix = vectorizer.fit_transform(all_tokens)
         feature_names = vectorizer.get_feature_names_out()
         scores = tfidf_matrix.sum(axis=0).A1
         
-        # Create keyword dictionary
-        keywords = dict(zip(feature_names, scores))
+        # Create keyword dictionary, showing the words as people wrote them
+        keywords = {analyzer.original(term): score for term, score in zip(feature_names, scores)}
         
         # Sort by importance
         sorted_keywords = sorted(keywords.items(), key=lambda x: x[1], reverse=True)
@@ -398,76 +778,99 @@ def extract_keywords(reviews, top_n=20):
         st.warning(f"Could not extract keywords: {str(e)}")
         return {}
 
-def find_review_patterns(reviews):
+def reviews_fingerprint(reviews):
     """
-    Find common patterns and similarities between reviews
+    Short id for exactly this set of reviews (order doesn't matter)
+    """
+    return hashlib.sha1("".join(sorted(review_hash(r) for r in reviews)).encode('utf-8')).hexdigest()
+
+def shared_keywords(reviews, top_n=20):
+    """
+    Keywords for exactly these reviews, shared between processes and sessions
     """
-    patterns = {
-        'common_issues': [],
-        'positive_aspects': [],
-        'feature_mentions': [],
-        'rating_patterns': {}
-    }
     
-    # Define pattern keywords
-    issue_keywords = [
-        'erro', 'erros', 'problema', 'problemas', 'falha', 'falhas', 'bug', 'bugs',
-        'não funciona', 'não está funcionando', 'crash', 'trava', 'lento', 'demora',
-        'atualização', 'versão', 'instabilidade', 'instável', 'péssimo', 'terrível'
-    ]
+    return get_shared_cache().get_or_compute(
+        f"keywords:v2:{reviews_fingerprint(reviews)}:{top_n}", lambda: extract_keywords(reviews, top_n=top_n), ttl=ANALYSIS_CACHE_SECONDS
+    )
+
+def keyword_cloud_png(keywords):
+    """
+    Word cloud image (PNG bytes) for keyword scores, shared between processes and sessions
+    Cached by the keywords and their scores, so it's only drawn again when they change
+    """
+    frequencies = {keyword: round(float(score), 4) for keyword, score in keywords.items()}
+    fingerprint = hashlib.sha1(json.dumps(frequencies, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
     
-    positive_keywords = [
-        'bom', 'boa', 'ótimo', 'ótima', 'excelente', 'funciona bem', 'rápido',
-        'fácil', 'simples', 'recomendo', 'satisfeito', 'contento', 'útil'
-    ]
+    def render():
+        with span("render word cloud"):
+            image = WordCloud(width=800, height=400, background_color="white").generate_from_frequencies(frequencies).to_image()
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            return buffer.getvalue()
     
-    feature_keywords = [
-        'estacionar', 'estacionamento', 'portagem', 'portagens', 'carregamento',
-        'carregar', 'app', 'aplicação', 'interface', 'menu', 'pagamento'
-    ]
+    return get_shared_cache().get_or_compute(f"wordcloud:{fingerprint}", render, ttl=ANALYSIS_CACHE_SECONDS)
+
+# Pattern keywords (Portuguese), checked with a simple "is this text inside the review" test
+ISSUE_KEYWORDS = [
+    'erro', 'erros', 'problema', 'problemas', 'falha', 'falhas', 'bug', 'bugs',
+    'não funciona', 'não está funcionando', 'crash', 'trava', 'lento', 'demora',
+    'atualização', 'versão', 'instabilidade', 'instável', 'péssimo', 'terrível'
+]
+
+POSITIVE_KEYWORDS = [
+    'bom', 'boa', 'ótimo', 'ótima', 'excelente', 'funciona bem', 'rápido',
+    'fácil', 'simples', 'recomendo', 'satisfeito', 'contento', 'útil'
+]
+
+FEATURE_KEYWORDS = [
+    'estacionar', 'estacionamento', 'portagem', 'portagens', 'carregamento',
+    'carregar', 'app', 'aplicação', 'interface', 'menu', 'pagamento'
+]
+
+# Keywords paired with their accent-free form, folded once when the module loads
+FOLDED_PATTERN_KEYWORDS = {
+    category: [(keyword, fold_accents(keyword)) for keyword in keywords]
+    for category, keywords in (
+        ('common_issues', ISSUE_KEYWORDS),
+        ('positive_aspects', POSITIVE_KEYWORDS),
+        ('feature_mentions', FEATURE_KEYWORDS)
+    )
+}
+
+@timed("patterns")
+def find_review_patterns(reviews):
+    """
+    Find common patterns and similarities between reviews
+    """
+    return summarize_review_patterns(reviews, [review_pattern_matches(review) for review in reviews])
+
+def review_pattern_matches(review):
+    """
+    Which issue, positive and feature keywords one review mentions (None when there is no text)
+    """
+    forms = text_forms(review)
     
-    # Analyze each review
-    for review in reviews:
-        text = review.get('review', '').lower()
-        rating = review.get('rating', 0)
-        
-        if not text or text == "review text not available":
-            continue
-        
-        # Find issues
-        for keyword in issue_keywords:
-            if keyword in text:
-                patterns['common_issues'].append({
-                    'keyword': keyword,
-                    'reviewer': review.get('reviewer_name', 'Unknown'),
-                    'rating': rating,
-                    'context': text[max(0, text.find(keyword)-50):text.find(keyword)+100]
-                })
-        
-        # Find positive aspects
-        for keyword in positive_keywords:
-            if keyword in text:
-                patterns['positive_aspects'].append({
-                    'keyword': keyword,
-                    'reviewer': review.get('reviewer_name', 'Unknown'),
-                    'rating': rating,
-                    'context': text[max(0, text.find(keyword)-50):text.find(keyword)+100]
-                })
-        
-        # Find feature mentions
-        for keyword in feature_keywords:
-            if keyword in text:
-                patterns['feature_mentions'].append({
-                    'keyword': keyword,
-                    'reviewer': review.get('reviewer_name', 'Unknown'),
-                    'rating': rating,
-                    'context': text[max(0, text.find(keyword)-50):text.find(keyword)+100]
-                })
-    
-    # Count patterns
-    patterns['common_issues'] = Counter([p['keyword'] for p in patterns['common_issues']]).most_common(10)
-    patterns['positive_aspects'] = Counter([p['keyword'] for p in patterns['positive_aspects']]).most_common(10)
-    patterns['feature_mentions'] = Counter([p['keyword'] for p in patterns['feature_mentions']]).most_common(10)
+    if not forms["has_text"]:
+        return None
+    
+    # Compare without accents, so "nao funciona" also counts as "não funciona"
+    text = forms["folded"]
+    return {
+        category: [keyword for keyword, folded_keyword in keywords if folded_keyword in text]
+        for category, keywords in FOLDED_PATTERN_KEYWORDS.items()
+    }
+
+def summarize_review_patterns(reviews, matches):
+    """
+    Count keyword mentions from per-review matches into the patterns dictionary
+    """
+    patterns = {}
+    for category in ('common_issues', 'positive_aspects', 'feature_mentions'):
+        counter = Counter()
+        for review_matches in matches:
+            if review_matches:
+                counter.update(review_matches[category])
+        patterns[category] = counter.most_common(10)
     
     # Rating patterns
     rating_counts = Counter([r.get('rating', 0) for r in reviews])
@@ -475,9 +878,99 @@ def find_review_patterns(reviews):
     
     return patterns
 
-def analyze_with_gemini(reviews, gemini_api_key):
+# Via Verde features and the (accent-free) words that mention them
+ASPECT_KEYWORDS = {
+    'portagem': ['portagem', 'portagens', 'toll', 'tolls'],
+    'estacionamento': ['estacionar', 'estacionamento', 'parque', 'parking'],
+    'carregamento': ['carregamento', 'carregar', 'carregador', 'charging'],
+    'pagamento': ['pagamento', 'pagamentos', 'pagar', 'mbway', 'cartao', 'payment'],
+    'interface': ['interface', 'menu', 'design', 'ecra'],
+    'conta': ['conta', 'login', 'registo', 'password', 'account']
+}
+ASPECT_NAMES = list(ASPECT_KEYWORDS.keys())
+ASPECT_TERM_INDEX = {term: index for index, aspect in enumerate(ASPECT_NAMES) for term in ASPECT_KEYWORDS[aspect]}
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+def split_sentences(review):
+    """
+    Sentences of a review (from its normalized text)
+    """
+    forms = text_forms(review)
+    if not forms["has_text"]:
+        return []
+    return [sentence for sentence in SENTENCE_SPLIT.split(forms["nfc"]) if sentence.strip()]
+
+@timed("aspect sentiment")
+def analyze_aspect_sentiment(reviews, store=None):
+    """
+    Sentiment per Via Verde feature: every sentence passes its TextBlob polarity
+    to the features it mentions, and the totals are taken with sparse matrix products
+    With a `store`, sentence polarities are saved per review and only new reviews go through TextBlob
+    """
+    hashes = [review_hash(review) for review in reviews]
+    saved = store.get_results("sentence_polarity", hashes) if store else {}
+    new_polarities = {}
+    
+    # Score the sentences of every review without saved polarities in one go (in the worker processes)
+    review_sentences = [split_sentences(review) for review in reviews]
+    unscored = [(hash_value, sentences) for hash_value, sentences in zip(hashes, review_sentences)
+                if saved.get(hash_value) is None or len(saved[hash_value]) != len(sentences)]
+    scores = iter(textblob_scores_in_processes([sentence for _, sentences in unscored for sentence in sentences]))
+    for hash_value, sentences in unscored:
+        new_polarities[hash_value] = [next(scores)[0] for _ in sentences]
+    
+    rows, columns, polarities = [], [], []
+    for hash_value, sentences in zip(hashes, review_sentences):
+        review_polarities = new_polarities.get(hash_value) or saved.get(hash_value) or []
+        for sentence, polarity in zip(sentences, review_polarities):
+            sentence_row = len(polarities)
+            polarities.append(polarity)
+            aspects = {ASPECT_TERM_INDEX[token] for token in TOKEN_PATTERN.findall(fold_accents(sentence.lower()))
+                       if token in ASPECT_TERM_INDEX}
+            for aspect_index in aspects:
+                rows.append(sentence_row)
+                columns.append(aspect_index)
+    
+    if store and new_polarities:
+        store.save_results("sentence_polarity", new_polarities)
+    
+    if not rows:
+        return []
+    
+    # mentions[s, a] = 1 when sentence s talks about aspect a
+    mentions = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(polarities), len(ASPECT_NAMES))
+    )
+    polarity = np.array(polarities)
+    mentions_t = mentions.T.tocsr()
+    
+    counts = np.asarray(mentions.sum(axis=0)).ravel()
+    polarity_sums = mentions_t @ polarity
+    positive = mentions_t @ (polarity > 0.1).astype(float)
+    negative = mentions_t @ (polarity < -0.1).astype(float)
+    
+    aspects = []
+    for index, aspect in enumerate(ASPECT_NAMES):
+        if counts[index] == 0:
+            continue
+        aspects.append({
+            'aspect': aspect,
+            'mentions': int(counts[index]),
+            'avg_polarity': float(polarity_sums[index] / counts[index]),
+            'positive': int(positive[index]),
+            'negative': int(negative[index]),
+            'neutral': int(counts[index] - positive[index] - negative[index])
+        })
+    
+    return sorted(aspects, key=lambda aspect: aspect['mentions'], reverse=True)
+
+@timed("gemini overall")
+def analyze_with_gemini(reviews, gemini_api_key, store=None, token_budget=DEFAULT_TOKEN_BUDGET):
     """
     Advanced sentiment analysis and insights using Gemini AI
+    The prompt holds a rating-balanced sample of the reviews that fits in `token_budget` tokens
+    With a `store`, the answer is saved and reused while the analyzed reviews stay the same
     """
     if not GEMINI_AVAILABLE:
         st.warning("🤖 Gemini AI is not available. Please install google-generativeai package.")
@@ -491,22 +984,23 @@ def analyze_with_gemini(reviews, gemini_api_key):
         genai.configure(api_key=gemini_api_key)
         model = genai.GenerativeModel('gemini-pro')
         
-        # Combine all review texts
-        all_reviews_text = []
-        for review in reviews:
-            text = review.get('review', '')
-            if text and text != "Review text not available":
-                all_reviews_text.append(f"⭐ {review.get('rating', 0)}/5 - {text}")
-        
-        if not all_reviews_text:
+        # A sample that follows the rating distribution and fits the token budget
+        sampled_lines = sample_reviews(reviews, token_budget)
+        if not sampled_lines:
             return None
         
+        # Tell Gemini how the whole corpus is distributed, since it only sees a sample
+        rating_counts = Counter(review.get('rating', 0) for review in reviews)
+        distribution = ", ".join(f"{rating}⭐: {rating_counts[rating]}" for rating in sorted(rating_counts, reverse=True))
+        
         # Create comprehensive prompt for Portuguese app reviews
-        reviews_sample = "\n".join(all_reviews_text[:10])  # Analyze first 10 reviews
+        reviews_sample = "\n".join(sampled_lines)
         
         prompt = f"""
         Analisa as seguintes avaliações da aplicação Via Verde (app português para portagens e estacionamento) e fornece uma análise detalhada em português:
 
+        AMOSTRA: {len(sampled_lines)} de {len(reviews)} avaliações (distribuição total por classificação - {distribution})
+
         AVALIAÇÕES:
         {reviews_sample}
 
@@ -525,7 +1019,22 @@ def analyze_with_gemini(reviews, gemini_api_key):
         Responde APENAS com JSON válido, sem texto adicional.
         """
         
-        response = model.generate_content(prompt)
+        # Size of the request, known before calling Gemini
+        prompt_info = {
+            "sampled_reviews": len(sampled_lines),
+            "total_reviews": len(reviews),
+            "estimated_tokens": estimate_tokens(prompt),
+            "token_budget": token_budget
+        }
+        
+        # Same prompt means same reviews - reuse the saved answer
+        cache_name = f"gemini_overall_{hashlib.sha1(prompt.encode('utf-8')).hexdigest()}"
+        if store:
+            cached_analysis = store.get_aggregate(cache_name)
+            if cached_analysis:
+                return dict(cached_analysis, prompt_info=prompt_info)
+        
+        response = generate_content(model, prompt)
         
         # Try to parse JSON response
         try:
@@ -538,23 +1047,28 @@ def analyze_with_gemini(reviews, gemini_api_key):
                 response_text = response_text[:-3]
             
             analysis_result = json.loads(response_text)
-            return analysis_result
+            if store:
+                store.save_aggregate(cache_name, analysis_result)
+            return dict(analysis_result, prompt_info=prompt_info)
         except json.JSONDecodeError:
             # Fallback: return structured text analysis
             return {
                 "sentimento_geral": "neutro",
                 "resumo_executivo": response.text[:200] + "...",
                 "pontuacao_sentimento": 0,
-                "analise_completa": response.text
+                "analise_completa": response.text,
+                "prompt_info": prompt_info
             }
     
     except Exception as e:
         st.error(f"Erro na análise Gemini: {str(e)}")
         return None
 
-def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
+@timed("gemini individual")
+def analyze_individual_reviews_with_gemini(reviews, gemini_api_key, store=None):
     """
     Analyze individual reviews with Gemini for detailed sentiment
+    With a `store`, reviews that were analyzed before are not sent to Gemini again
     """
     if not GEMINI_AVAILABLE:
         st.warning("🤖 Gemini AI is not available. Please install google-generativeai package.")
@@ -569,14 +1083,21 @@ def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
         
         analyzed_reviews = []
         
+        # Answers saved on earlier runs, keyed by review hash
+        saved_analyses = store.get_results("gemini_individual", [review_hash(r) for r in reviews[:20]]) if store else {}
+        new_analyses = {}
+        
         # Process reviews in batches to avoid rate limits
         batch_size = 5
         for i in range(0, min(len(reviews), 20), batch_size):  # Limit to first 20 reviews
             batch = reviews[i:i+batch_size]
             
             for review in batch:
-                text = review.get('review', '')
-                if text and text != "Review text not available":
+                forms = text_forms(review)
+                text = forms["nfc"]
+                if saved_analyses.get(review_hash(review)):
+                    analyzed_reviews.append(saved_analyses[review_hash(review)])
+                elif forms["has_text"]:
                     prompt = f"""
                     Analisa esta avaliação da aplicação Via Verde e fornece análise JSON:
 
@@ -595,7 +1116,7 @@ def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
                     """
                     
                     try:
-                        response = model.generate_content(prompt)
+                        response = generate_content(model, prompt)
                         response_text = response.text.strip()
                         
                         # Clean JSON response
@@ -606,7 +1127,7 @@ def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
                         
                         analysis = json.loads(response_text)
                         
-                        analyzed_reviews.append({
+                        review_analysis = {
                             'reviewer_name': review.get('reviewer_name', 'Unknown'),
                             'rating': review.get('rating', 0),
                             'review_text': text[:100] + "..." if len(text) > 100 else text,
@@ -616,7 +1137,9 @@ def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
                             'main_problem': analysis.get('problema_principal', ''),
                             'positive_aspect': analysis.get('aspecto_positivo', ''),
                             'gemini_score': analysis.get('pontuacao', 0)
-                        })
+                        }
+                        analyzed_reviews.append(review_analysis)
+                        new_analyses[review_hash(review)] = review_analysis
                     except Exception as e:
                         # Fallback to basic analysis
                         analyzed_reviews.append({
@@ -631,12 +1154,17 @@ def analyze_individual_reviews_with_gemini(reviews, gemini_api_key):
                             'gemini_score': 0
                         })
         
+        # Only real Gemini answers are saved, fallbacks are retried next time
+        if store and new_analyses:
+            store.save_results("gemini_individual", new_analyses)
+        
         return analyzed_reviews
     
     except Exception as e:
         st.error(f"Erro na análise individual Gemini: {str(e)}")
         return []
 
+@timed("group by rating")
 def group_reviews_by_rating(reviews):
     """
     Group reviews by their rating (1-5 stars)
@@ -651,27 +1179,351 @@ def group_reviews_by_rating(reviews):
     # Sort ratings from 5 to 1 (best to worst)
     return dict(sorted(grouped.items(), reverse=True))
 
+def stream_all_reviews(targets, stored_ios_reviews, batch_size=REVIEW_BATCH_SIZE):
+    """
+    Yield batches of reviews for all targets as soon as they are ready
+    Play Store pages and the App Store feeds are downloaded at the same time in worker threads,
+    and each Play Store page is parsed batch by batch as soon as it arrives
+    """
+    ios_targets = [target for target in targets if target.get("app_store_id")]
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_FETCHES) as executor:
+        ios_future = submit_with_context(executor, collect_app_store_reviews, targets, stored_ios_reviews) if ios_targets else None
+        page_futures = [submit_with_context(executor, fetch_google_play_page, target["app_id"], target.get("locale", "pt_PT"))
+                        for target in targets]
+        
+        for target, page_future in zip(targets, page_futures):
+            yield from stream_google_play_reviews(
+                target["app_id"], target.get("locale", "pt_PT"), target.get("label"), batch_size, fetch=page_future.result
+            )
+        
+        if ios_future is not None:
+            ios_reviews = ios_future.result()
+            if ios_reviews:
+                yield ios_reviews
+
+def fetch_all_reviews(targets, stored_ios_reviews):
+    """
+    Android reviews for all targets, and iOS reviews where an App Store id is configured
+    Both stores are fetched at the same time
+    """
+    android_reviews, ios_reviews = [], []
+    for batch in stream_all_reviews(targets, stored_ios_reviews):
+        for review in batch:
+            (ios_reviews if review["os"] == "iOS" else android_reviews).append(review)
+    return android_reviews, ios_reviews
+
+def load_reviews_progressively(targets):
+    """
+    First load for a set of apps: show the review count and the latest reviews while they come in,
+    instead of a spinner until everything is parsed
+    """
+    progress = st.empty()
+    preview = st.empty()
+    android_reviews, ios_reviews = [], []
+    progress.info("⏳ Getting reviews...")
+    
+    for batch in stream_all_reviews(targets, []):
+        for review in batch:
+            (ios_reviews if review["os"] == "iOS" else android_reviews).append(review)
+        
+        progress.info(f"⏳ Loading reviews... {len(android_reviews)} Android and {len(ios_reviews)} iOS so far")
+        with preview.container():
+            for review in batch[:5]:
+                st.write(f"{'⭐' * review['rating']} 👤 **{review['reviewer_name']}** ({review['date']})")
+                st.write(f"📝 {review['review']}")
+    
+    progress.empty()
+    preview.empty()
+    return android_reviews, ios_reviews
+
+def refresh_snapshot(store, targets, snapshot_key, stored_ios_reviews):
+    """
+    Fetch fresh reviews, analyze the new ones and save them as the latest snapshot
+    A failed fetch (no reviews at all) keeps the previous snapshot
+    """
+    try:
+        android_reviews, ios_reviews = fetch_all_reviews(targets, stored_ios_reviews)
+        if android_reviews or ios_reviews:
+            analyze_reviews_incrementally(android_reviews + ios_reviews, store)
+            store.save_snapshot(snapshot_key, android_reviews, ios_reviews)
+    except Exception as e:
+        print(f"⚠️ Background refresh failed for {snapshot_key}: {e}")
+
+def start_background_refresh(store, targets, snapshot_key, stored_ios_reviews):
+    """
+    Refresh a snapshot in a background thread, unless one is already running for it
+    """
+    with _background_lock:
+        thread = _background_refreshes.get(snapshot_key)
+        if thread and thread.is_alive():
+            return False
+        thread = threading.Thread(
+            target=refresh_snapshot,
+            args=(store, targets, snapshot_key, stored_ios_reviews),
+            name=f"refresh {snapshot_key}",
+            daemon=True
+        )
+        _background_refreshes[snapshot_key] = thread
+        thread.start()
+        return True
+
+def is_refreshing(snapshot_key):
+    thread = _background_refreshes.get(snapshot_key)
+    return bool(thread and thread.is_alive())
+
+@st.fragment(run_every=3)
+def watch_for_new_snapshot(store, snapshot_key, shown_taken_at):
+    """
+    Checks every few seconds whether the background refresh saved newer data, and reloads the page if so
+    """
+    if not is_refreshing(snapshot_key) and store.snapshot_time(snapshot_key) != shown_taken_at:
+        st.rerun(scope="app")
+
+@st.cache_resource
+def get_review_store():
+    """
+    One review store for the whole server process
+    """
+    store = ReviewStore()
+    # Per-day totals from older versions could count a review more than once: recompute them once
+    store.rebuild_daily_rollups(daily_rollup_totals, version=DAILY_ROLLUPS_VERSION)
+    # History keywords used to be counted without stopwords and stemming: count them again the current way
+    store.rebuild_term_stats("keywords", keyword_term_totals, version=HISTORY_KEYWORDS_VERSION)
+    return store
+
+@st.cache_resource(max_entries=8)
+def get_time_index(snapshot_key, taken_at, _reviews):
+    """
+    Date index of a snapshot's reviews, built once per snapshot (key and taken_at)
+    and shared by every session and rerun that shows it
+    """
+    return ReviewTimeIndex(_reviews)
+
+def load_snapshot_cached(store, snapshot_key):
+    """
+    The latest snapshot, read from the store only when it changed since the last read
+    Text forms are computed before it goes into memory, so its size is counted correctly
+    """
+    taken_at = store.snapshot_time(snapshot_key)
+    if taken_at is None:
+        return None
+    
+    def load():
+        snapshot = store.load_snapshot(snapshot_key)
+        for review in snapshot["android"] + snapshot["ios"]:
+            text_forms(review)
+        return snapshot
+    
+    return get_snapshot_memory().get_or_compute((snapshot_key, taken_at), load)
+
+@timed("incremental analysis")
+def analyze_reviews_incrementally(reviews, store):
+    """
+    Sentiment and patterns for `reviews`, running TextBlob and the keyword checks
+    only on reviews that have no saved results yet
+    Newly stored reviews are also added to the totals for the whole history
+    """
+    for review in reviews:
+        review["review_hash"] = review_hash(review)
+    hashes = [review["review_hash"] for review in reviews]
+    
+    results = {}
+    analyses = (
+        ("sentiment", review_sentiments),
+        ("patterns", lambda batch: [review_pattern_matches(review) for review in batch])
+    )
+    for kind, analyze in analyses:
+        saved = store.get_results(kind, hashes)
+        missing_reviews = [review for review in reviews if review["review_hash"] not in saved]
+        missing = dict(zip([review["review_hash"] for review in missing_reviews], analyze(missing_reviews)))
+        if missing:
+            store.save_results(kind, missing)
+            saved.update(missing)
+        results[kind] = saved
+    
+    # The store decides which reviews are new and adds them to the totals in one transaction
+    store.add_reviews(reviews, totals_for=lambda new: corpus_totals(new, results))
+    
+    sentiments = [results["sentiment"][h] for h in hashes if results["sentiment"][h]]
+    patterns = summarize_review_patterns(reviews, [results["patterns"][h] for h in hashes])
+    return sentiments, patterns
+
+@timed("history analysis (chunked)")
+def analyze_history_in_chunks(store, chunk_size=HISTORY_CHUNK_SIZE):
+    """
+    Sentiment, ratings and top keywords for every stored review, read from the store
+    a chunk at a time and added to running totals - memory stays flat however many reviews there are
+    Saved sentiment results are reused; missing ones are computed and saved
+    """
+    stats = StreamingReviewStats()
+    analyzer = KeywordAnalyzer(max_words=HISTORY_WORD_FORMS)
+    for chunk in store.iter_reviews(chunk_size):
+        hashes = [review["review_hash"] for review in chunk]
+        sentiments = store.get_results("sentiment", hashes)
+        missing_reviews = [review for review in chunk if review["review_hash"] not in sentiments]
+        if missing_reviews:
+            missing = dict(zip([review["review_hash"] for review in missing_reviews], review_sentiments(missing_reviews)))
+            store.save_results("sentiment", missing)
+            sentiments.update(missing)
+        
+        for review in chunk:
+            forms = text_forms(review)
+            terms = set(analyzer(forms["tokens"])) if forms["has_text"] else ()  # once per review
+            stats.add(review, sentiments.get(review["review_hash"]), terms)
+    
+    summary = stats.summary()
+    summary["top_keywords"] = [(analyzer.original(term), count) for term, count in summary["top_keywords"]]
+    return summary
+
+def corpus_totals(new_reviews, results):
+    """
+    What the new reviews add to the saved history totals (cost grows with new reviews, not the corpus)
+    Returned as increments, which the review store adds in SQL (see ReviewStore.add_reviews)
+    """
+    counters = Counter()
+    for review in new_reviews:
+        sentiment = results["sentiment"].get(review["review_hash"])
+        if sentiment:
+            counters[("sentiment", "count")] += 1
+            counters[("sentiment", "polarity_sum")] += sentiment["polarity"]
+            counters[("sentiment", "subjectivity_sum")] += sentiment["subjectivity"]
+            counters[("tones", sentiment["tone"])] += 1
+        
+        matches = results["patterns"].get(review["review_hash"])
+        if matches:
+            for category, keywords in matches.items():
+                for keyword in keywords:
+                    counters[(category, keyword)] += 1
+        
+        counters[("ratings", str(review.get('rating', 0)))] += 1
+    
+    term_totals = keyword_term_totals(new_reviews, results)
+    return {
+        "counters": counters,
+        "terms": {"keywords": term_totals} if term_totals[1] else {},
+        "daily": daily_rollup_totals(new_reviews, results)
+    }
+
+def keyword_term_totals(new_reviews, results):
+    """
+    Keyword statistics of every review with text (review_pattern_matches gives those a result,
+    even when no pattern matched; reviews without text have None and are skipped):
+    term frequency plus one document count per review, with the same stopwords and stemming
+    as the keyword analysis (KeywordAnalyzer)
+    Returns ({term: (tf, df)}, documents, {(stem, word): count}) - the word forms are kept
+    so the history can show each stemmed word as people wrote it
+    """
+    analyzer = KeywordAnalyzer()
+    term_counts = {}
+    documents = 0
+    for review in new_reviews:
+        if not results["patterns"].get(review["review_hash"]):
+            continue
+        documents += 1
+        forms = text_forms(review)
+        for term, count in Counter(analyzer(forms["tokens"]) if forms["has_text"] else ()).items():
+            tf, df = term_counts.get(term, (0, 0))
+            term_counts[term] = (tf + count, df + 1)
+    word_forms = {(word_stem, word): count
+                  for word_stem, counts in analyzer.word_counts.items() for word, count in counts.items()}
+    return term_counts, documents, word_forms
+
+def daily_rollup_totals(new_reviews, results):
+    """
+    What the new reviews add to the per-day totals used by the trend charts
+    Reviews without a readable date can't be placed on a day and are skipped
+    """
+    rollups = {}
+    keyword_mentions = {}
+    for review in new_reviews:
+        day = review.get('date_iso')
+        if not day:
+            continue
+        source = review.get('source', 'Via Verde')
+        
+        rollup = rollups.setdefault((day, source), {"reviews": 0, "rating_sum": 0, "one_star": 0, "sentiment_count": 0, "polarity_sum": 0.0})
+        rollup["reviews"] += 1
+        rollup["rating_sum"] += review.get('rating', 0)
+        rollup["one_star"] += 1 if review.get('rating') == 1 else 0
+        
+        sentiment = results["sentiment"].get(review["review_hash"])
+        if sentiment:
+            rollup["sentiment_count"] += 1
+            rollup["polarity_sum"] += sentiment["polarity"]
+        
+        matches = results["patterns"].get(review["review_hash"])
+        if matches:
+            for keyword in matches["common_issues"]:
+                keyword_mentions[(day, source, keyword)] = keyword_mentions.get((day, source, keyword), 0) + 1
+    
+    return rollups, keyword_mentions
+
 def create_streamlit_app():
     """
     Create the main Streamlit app to display reviews
     """
     st.set_page_config(page_title="Via Verde Reviews", page_icon="📱")
     
+    # Timing spans for this run (shown in the sidebar debug panel)
+    run_timings = start_run("review dashboard")
+    show_debug = st.sidebar.checkbox("🐞 Show timing debug panel", value=False)
+    
     st.title("🤖 Via Verde Android Reviews")
-    st.write("All visible reviews from Google Play Store (Apple Store on hold)")
+    st.write("All visible reviews from Google Play Store (and the App Store where configured)")
+    
+    # Let people know when data comes from recorded cassettes instead of the live site
+    if get_mode() != "live":
+        st.caption(f"🎞️ HTTP mode: **{get_mode()}** (cassettes in `REVIEW_CASSETTE_DIR`)")
     
     # Add info about the focus
-    st.info("ℹ️ **Focus**: Currently showing Android reviews only. Apple Store reviews are on hold. Showing all visible reviews from the Portuguese page.")
+    st.info("ℹ️ **Focus**: Showing all visible Android reviews from the Portuguese page. Apple Store reviews are added for apps with an `app_store_id` in secrets.toml.")
     
-    # Get reviews from Android only (Apple Store on hold)
-    with st.spinner("Getting Android reviews..."):
-        android_reviews = get_google_play_reviews()
-        all_reviews = android_reviews  # Only Android reviews for now
+    # Pick which apps to show (configured in secrets.toml, Via Verde by default)
+    review_targets = get_review_targets()
+    target_labels = [target["label"] for target in review_targets]
+    selected_labels = st.sidebar.multiselect("📱 Apps to compare", target_labels, default=target_labels)
+    selected_targets = [target for target in review_targets if target["label"] in selected_labels]
+    
+    # Show the last saved snapshot right away and refresh it in the background.
+    # Only the very first visit for a set of apps has to wait for the download.
+    review_store = get_review_store()
+    snapshot_key = "|".join(sorted(selected_labels))
+    with span("load reviews"):
+        snapshot = load_snapshot_cached(review_store, snapshot_key)
+        if snapshot is None:
+            android_reviews, ios_reviews = load_reviews_progressively(selected_targets)
+            snapshot = {"taken_at": datetime.now().isoformat(timespec="seconds"), "android": android_reviews, "ios": ios_reviews}
+            if android_reviews or ios_reviews:
+                snapshot = review_store.save_snapshot(snapshot_key, android_reviews, ios_reviews)
+        elif (datetime.now() - datetime.fromisoformat(snapshot["taken_at"])).total_seconds() > SNAPSHOT_REFRESH_SECONDS:
+            start_background_refresh(review_store, selected_targets, snapshot_key, snapshot["ios"])
+        
+        android_reviews = snapshot["android"]
+        ios_reviews = snapshot["ios"]
+        all_reviews = android_reviews + ios_reviews
+    
+    if is_refreshing(snapshot_key):
+        st.caption(f"🕒 Data as of {snapshot['taken_at'].replace('T', ' ')} · refreshing in the background...")
+        watch_for_new_snapshot(review_store, snapshot_key, snapshot["taken_at"])
+    else:
+        st.caption(f"🕒 Data as of {snapshot['taken_at'].replace('T', ' ')}")
+    
+    # Time window filter - uses a sorted date index instead of scanning every review
+    time_windows = {"All time": None, "Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90}
+    selected_window = st.selectbox("📅 Time window", list(time_windows.keys()))
+    if time_windows[selected_window]:
+        time_index = get_time_index(snapshot_key, snapshot["taken_at"], android_reviews + ios_reviews)
+        all_reviews = time_index.last_days(time_windows[selected_window])
+        if time_index.undated:
+            st.caption(f"{len(time_index.undated)} reviews without a readable date are hidden in this view")
     
     # Add refresh and save buttons
     col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
     with col2:
         if st.button("🔄 Refresh Reviews", type="primary"):
+            # Mark the downloaded pages as stale and download them again in the background
+            get_shared_cache().expire("page:")
+            start_background_refresh(review_store, selected_targets, snapshot_key, ios_reviews)
             st.rerun()
     
     with col3:
@@ -762,6 +1614,8 @@ def create_streamlit_app():
     
     with col2:
         st.metric("Android Reviews", len(android_reviews))
+        if ios_reviews:
+            st.caption(f"+ {len(ios_reviews)} iOS reviews")
     
     with col3:
         avg_rating = sum(review["rating"] for review in all_reviews) / len(all_reviews) if all_reviews else 0
@@ -782,58 +1636,65 @@ def create_streamlit_app():
         avg_useful = total_useful / len(all_reviews) if all_reviews else 0
         st.metric("Avg Useful per Review", f"{avg_useful:.1f}")
     
+    # Side-by-side comparison when more than one app is selected
+    if len(selected_targets) > 1:
+        show_app_comparison(all_reviews, selected_labels)
+    
     st.markdown("---")
     
     # Display reviews by rating (Android only)
     st.subheader("⭐ Android Reviews by Rating")
     
-    if all_reviews and grouped_reviews:
-        for rating in sorted(grouped_reviews.keys(), reverse=True):
-            reviews_for_rating = grouped_reviews[rating]
-            stars = "⭐" * rating
-            
-            st.write(f"### {stars} ({len(reviews_for_rating)} reviews)")
-            
-            # Show Android reviews with enhanced information
-            for review in reviews_for_rating:
-                # Create a more detailed display
-                col1, col2 = st.columns([3, 1])
+    with span("render reviews"):
+        if all_reviews and grouped_reviews:
+            for rating in sorted(grouped_reviews.keys(), reverse=True):
+                reviews_for_rating = grouped_reviews[rating]
+                stars = "⭐" * rating
                 
-                with col1:
-                    # Main review content
-                    reviewer_name = review['reviewer_name']
-                    if reviewer_name == "Unknown":
-                        reviewer_info = "**Anonymous**"
-                    else:
-                        reviewer_info = f"**{reviewer_name}**"
+                st.write(f"### {stars} ({len(reviews_for_rating)} reviews)")
+                
+                # Show Android reviews with enhanced information
+                for review in reviews_for_rating:
+                    # Create a more detailed display
+                    col1, col2 = st.columns([3, 1])
                     
-                    date_info = f"({review['date']})"
+                    with col1:
+                        # Main review content
+                        reviewer_name = review['reviewer_name']
+                        if reviewer_name == "Unknown":
+                            reviewer_info = "**Anonymous**"
+                        else:
+                            reviewer_info = f"**{reviewer_name}**"
+                        
+                        date_info = f"({review['date']})"
+                        if len(selected_targets) > 1:
+                            date_info += f" · 📱 {review.get('source', 'Unknown app')}"
+                        
+                        st.write(f"👤 {reviewer_info} {date_info}")
+                        st.write(f"📝 {review['review']}")
                     
-                    st.write(f"👤 {reviewer_info} {date_info}")
-                    st.write(f"📝 {review['review']}")
-                
-                with col2:
-                    # Useful count and rating
-                    if review['useful_count'] > 0:
-                        st.write(f"👍 {review['useful_count']} pessoas consideraram útil")
-                    else:
-                        st.write("👍 N/A")
+                    with col2:
+                        # Useful count and rating
+                        if review['useful_count'] > 0:
+                            st.write(f"👍 {review['useful_count']} pessoas consideraram útil")
+                        else:
+                            st.write("👍 N/A")
+                        
+                        # Show rating with stars
+                        stars = "⭐" * review['rating']
+                        st.write(f"⭐ {stars} ({review['rating']}/5)")
                     
-                    # Show rating with stars
-                    stars = "⭐" * review['rating']
-                    st.write(f"⭐ {stars} ({review['rating']}/5)")
+                    st.markdown("---")
                 
-                st.markdown("---")
-            
-            st.write("")  # Add some space between rating groups
-    else:
-        st.info("ℹ️ **No reviews found.** This could be due to:")
-        st.write("• Google Play Store blocking automated requests")
-        st.write("• Changes in the page structure")
-        st.write("• Network connectivity issues")
-        st.write("• Rate limiting from Google")
-        st.write("")
-        st.write("**Try clicking the refresh button or check back later.**")
+                st.write("")  # Add some space between rating groups
+        else:
+            st.info("ℹ️ **No reviews found.** This could be due to:")
+            st.write("• Google Play Store blocking automated requests")
+            st.write("• Changes in the page structure")
+            st.write("• Network connectivity issues")
+            st.write("• Rate limiting from Google")
+            st.write("")
+            st.write("**Try clicking the refresh button or check back later.**")
     
     # Analysis Section
     if all_reviews and len(all_reviews) > 0:
@@ -875,14 +1736,39 @@ def create_streamlit_app():
                 )
                 use_gemini = st.checkbox("Enable Gemini AI Analysis", value=bool(gemini_api_key))
         
+        # The analyses don't depend on each other, so they all run at the same time
+        # and the tabs below only display their results.
+        # Sentiment and patterns are saved per review, so only new reviews are analyzed.
+        # Results are also kept in this session (within its memory budget),
+        # so clicking around the page doesn't run them again
+        analysis_memory = session_cache(st.session_state)
+        analysis_key = reviews_fingerprint(all_reviews)
+        results = analysis_memory.get(analysis_key)
+        if results is None:
+            with st.spinner("Analyzing reviews..."):
+                analyses = run_analyses([
+                    Analysis("sentiment and patterns", analyze_reviews_incrementally, all_reviews, review_store,
+                             default=([], summarize_review_patterns(all_reviews, []))),
+                    Analysis("keywords", shared_keywords, all_reviews, top_n=15, default={}),
+                    Analysis("aspect sentiment", analyze_aspect_sentiment, all_reviews, review_store, default=[]),
+                    Analysis("history keywords", review_store.top_terms, "keywords", top_n=10, default={})
+                ])
+            for name, error in analyses.errors.items():
+                st.warning(f"⚠️ {name} analysis was skipped: {error}")
+            results = analyses.results
+            if not analyses.errors:
+                analysis_memory.set(analysis_key, results)
+        sentiments, patterns = results["sentiment and patterns"]
+        keywords = results["keywords"]
+        aspect_sentiment = results["aspect sentiment"]
+        history_keywords = results["history keywords"]
+        
         # Analysis tabs
         tab1, tab2, tab3, tab4, tab5 = st.tabs(["😊 Sentiment Analysis", "🔑 Keywords", "📊 Patterns", "🤖 Gemini AI", "📈 Summary"])
         
         with tab1:
             st.subheader("😊 Sentiment Analysis")
-            with st.spinner("Analyzing sentiment..."):
-                sentiments = analyze_sentiment(all_reviews)
-                
+            with st.spinner("Analyzing sentiment..."), span("render sentiment tab"):
                 if sentiments:
                     # Sentiment distribution
                     tone_counts = Counter([s['tone'] for s in sentiments])
@@ -918,9 +1804,7 @@ def create_streamlit_app():
         
         with tab2:
             st.subheader("🔑 Top Keywords & Phrases")
-            with st.spinner("Extracting keywords..."):
-                keywords = extract_keywords(all_reviews, top_n=15)
-                
+            with st.spinner("Extracting keywords..."), span("render keywords tab"):
                 if keywords:
                     col1, col2 = st.columns(2)
                     
@@ -933,14 +1817,20 @@ def create_streamlit_app():
                         st.write("**Keywords 9-15:**")
                         for i, (keyword, score) in enumerate(list(keywords.items())[8:], 9):
                             st.write(f"{i}. **{keyword}** (score: {score:.3f})")
+                    
+                    if WORDCLOUD_AVAILABLE:
+                        st.image(keyword_cloud_png(keywords), caption="Keyword cloud")
                 else:
                     st.warning("No keywords could be extracted from the reviews.")
+                
+                # Keywords across every review ever stored, read from the running totals
+                if history_keywords:
+                    st.write(f"**Across the stored history ({review_store.count()} reviews):**")
+                    st.write(", ".join(history_keywords.keys()))
         
         with tab3:
             st.subheader("📊 Review Patterns")
-            with st.spinner("Finding patterns..."):
-                patterns = find_review_patterns(all_reviews)
-                
+            with st.spinner("Finding patterns..."), span("render patterns tab"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -966,6 +1856,15 @@ def create_streamlit_app():
                     else:
                         st.write("No feature mentions identified")
                     
+                    st.write("**🎯 Sentiment by Feature:**")
+                    if aspect_sentiment:
+                        for aspect in aspect_sentiment:
+                            mood = "😊" if aspect['avg_polarity'] > 0.1 else "😞" if aspect['avg_polarity'] < -0.1 else "😐"
+                            st.write(f"• {mood} **{aspect['aspect']}**: {aspect['mentions']} mentions "
+                                     f"(👍 {aspect['positive']} / 👎 {aspect['negative']}, score {aspect['avg_polarity']:.2f})")
+                    else:
+                        st.write("No features mentioned in the reviews")
+                    
                     st.write("**⭐ Rating Distribution:**")
                     for rating, count in patterns['rating_patterns'].items():
                         percentage = (count / len(all_reviews)) * 100
@@ -975,11 +1874,16 @@ def create_streamlit_app():
             st.subheader("🤖 Gemini AI Analysis")
             
             if use_gemini and gemini_api_key:
-                with st.spinner("🤖 Gemini is analyzing your reviews..."):
+                with st.spinner("🤖 Gemini is analyzing your reviews..."), span("render gemini tab"):
                     # Overall analysis
-                    gemini_analysis = analyze_with_gemini(all_reviews, gemini_api_key)
+                    gemini_analysis = analyze_with_gemini(all_reviews, gemini_api_key, review_store)
                     
                     if gemini_analysis:
+                        prompt_info = gemini_analysis.get('prompt_info')
+                        if prompt_info:
+                            st.caption(f"🧮 Based on {prompt_info['sampled_reviews']} of {prompt_info['total_reviews']} reviews "
+                                       f"(~{prompt_info['estimated_tokens']} prompt tokens, budget {prompt_info['token_budget']} for reviews)")
+                        
                         col1, col2 = st.columns(2)
                         
                         with col1:
@@ -1050,7 +1954,7 @@ def create_streamlit_app():
                         st.write("---")
                         st.write("**🔍 Análise Individual de Avaliações:**")
                         
-                        individual_analysis = analyze_individual_reviews_with_gemini(all_reviews, gemini_api_key)
+                        individual_analysis = analyze_individual_reviews_with_gemini(all_reviews, gemini_api_key, review_store)
                         
                         if individual_analysis:
                             for analysis in individual_analysis[:10]:  # Show first 10
@@ -1148,6 +2052,156 @@ def create_streamlit_app():
                     st.success("✅ More positive aspects than issues mentioned")
                 else:
                     st.info("ℹ️ Balanced mention of issues and positive aspects")
+            
+            # Trend charts read the per-day totals, so they cost O(days) and not O(reviews)
+            show_trend_charts(review_store, selected_labels, patterns)
+            
+            # Whole stored history, from totals that are updated as reviews come in
+            history_sentiment = review_store.counters("sentiment")
+            history_tones = review_store.counters("tones")
+            if history_sentiment.get("count") and history_tones:
+                st.write("**🗄️ Stored History:**")
+                st.write(f"• Reviews analyzed so far: {history_sentiment['count']}")
+                st.write(f"• Average polarity: {history_sentiment['polarity_sum'] / history_sentiment['count']:.3f}")
+                top_tone = max(history_tones.items(), key=lambda x: x[1])
+                st.write(f"• Most common sentiment: **{top_tone[0]}** ({top_tone[1]} reviews)")
+            
+            # Full pass over the stored history, reading it in chunks (for very large stores)
+            if st.button("📚 Analyze the full stored history"):
+                with st.spinner(f"Reading the stored reviews {HISTORY_CHUNK_SIZE} at a time..."):
+                    history = analyze_history_in_chunks(review_store)
+                st.write(f"• Reviews: {history['reviews']} · average rating {history['avg_rating']:.2f} ⭐ · "
+                         f"average polarity {history['avg_polarity']:.3f}")
+                st.write("• Tones: " + ", ".join(f"{tone} ({count})" for tone, count in history['tones'].items()))
+                st.write("• Most frequent words and phrases: " + ", ".join(term for term, count in history['top_keywords'][:15]))
+                if history['keyword_max_error']:
+                    st.caption(f"Keyword counts are approximate (up to {history['keyword_max_error']} mentions too low)")
+
+    
+    if show_debug:
+        show_timing_debug_panel(run_timings)
+        show_memory_panel()
+
+def show_trend_charts(store, sources, patterns):
+    """
+    Daily average rating, share of 1-star reviews, sentiment and issue keywords over time
+    """
+    rollups = store.daily_rollups(sources)
+    if not rollups:
+        return
+    
+    st.write("**📈 Trends:**")
+    trends = pd.DataFrame([
+        {
+            "day": pd.to_datetime(row["day"]),
+            "Average rating": row["rating_sum"] / row["reviews"],
+            "1-star share (%)": row["one_star"] / row["reviews"] * 100,
+            "Average polarity": row["polarity_sum"] / row["sentiment_count"] if row["sentiment_count"] else None
+        }
+        for row in rollups
+    ]).set_index("day")
+    
+    st.line_chart(trends[["Average rating"]])
+    st.line_chart(trends[["1-star share (%)"]])
+    st.line_chart(trends[["Average polarity"]])
+    
+    # Top issue keywords of the current view, followed day by day
+    top_issues = [keyword for keyword, _ in patterns['common_issues'][:5]]
+    if top_issues:
+        mentions = store.daily_keyword_mentions(top_issues, sources)
+        if mentions:
+            issue_trends = pd.DataFrame.from_dict(mentions, orient="index").fillna(0)
+            issue_trends.index = pd.to_datetime(issue_trends.index)
+            st.write("Issue keywords per day:")
+            st.line_chart(issue_trends.sort_index())
+
+def show_app_comparison(reviews, labels):
+    """
+    One column per app with its review count, average rating and share of 1-star reviews
+    """
+    st.subheader("📱 App Comparison")
+    
+    reviews_by_source = {label: [] for label in labels}
+    for review in reviews:
+        if review.get("source") in reviews_by_source:
+            reviews_by_source[review["source"]].append(review)
+    
+    columns = st.columns(len(labels))
+    for column, label in zip(columns, labels):
+        source_reviews = reviews_by_source[label]
+        with column:
+            st.write(f"**{label}**")
+            st.metric("Reviews", len(source_reviews))
+            if source_reviews:
+                avg_rating = sum(r["rating"] for r in source_reviews) / len(source_reviews)
+                one_star_share = sum(1 for r in source_reviews if r["rating"] == 1) / len(source_reviews) * 100
+                st.metric("Average Rating", f"{avg_rating:.1f} ⭐")
+                st.metric("1-star Reviews", f"{one_star_share:.0f}%")
+            else:
+                st.write("No reviews found")
+
+def show_timing_debug_panel(run_timings):
+    """
+    Sidebar panel with the time spent in each stage and cache hit rates
+    """
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🐞 Timing Debug")
+    
+    totals = run_timings.totals()
+    if totals:
+        st.sidebar.dataframe(
+            pd.DataFrame([
+                {"stage": name, "calls": entry["calls"], "ms": entry["total_ms"]}
+                for name, entry in totals.items()
+            ]),
+            hide_index=True
+        )
+    else:
+        st.sidebar.write("No stages timed yet")
+    
+    st.sidebar.write("**Cache hit rates:**")
+    for name, stats in run_timings.cache_stats().items():
+        hit_rate = f"{stats['hit_rate'] * 100:.0f}%" if stats['hit_rate'] is not None else "n/a"
+        st.sidebar.write(f"• {name}: {hit_rate} ({stats['hits']} hits, {stats['misses']} misses)")
+    
+    timings_json = run_timings.to_json()
+    st.sidebar.download_button(
+        "⬇️ Download timings (JSON)",
+        data=timings_json,
+        file_name=f"timings_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json"
+    )
+    
+    # Optionally keep every run on disk as well
+    timings_dir = os.environ.get("REVIEW_TIMINGS_DIR")
+    if timings_dir:
+        os.makedirs(timings_dir, exist_ok=True)
+        with open(os.path.join(timings_dir, f"timings_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"), 'w', encoding='utf-8') as file:
+            file.write(timings_json)
+
+def show_memory_panel():
+    """
+    Sidebar admin view: how much memory the size-limited caches use, per cache and for all sessions
+    """
+    st.sidebar.subheader("🧠 Cache Memory")
+    stats = all_cache_stats()
+    
+    for cache in stats:
+        if cache["scope"] == "global":
+            st.sidebar.write(f"• {cache['name']}: {cache['entries']} entries, "
+                             f"{cache['bytes'] / 1024 / 1024:.1f} of {cache['max_bytes'] / 1024 / 1024:.0f} MB "
+                             f"({cache['evictions']} evicted)")
+    
+    sessions = [cache for cache in stats if cache["scope"] == "session"]
+    if sessions:
+        total_bytes = sum(cache["bytes"] for cache in sessions)
+        largest = max(sessions, key=lambda cache: cache["bytes"])
+        st.sidebar.write(f"• sessions: {len(sessions)} caches, {total_bytes / 1024 / 1024:.1f} MB in total "
+                         f"(largest {largest['bytes'] / 1024 / 1024:.1f} of {largest['max_bytes'] / 1024 / 1024:.0f} MB)")
+    
+    this_session = session_cache(st.session_state).stats()
+    st.sidebar.write(f"• this session: {this_session['entries']} entries, {this_session['bytes'] / 1024:.0f} KB "
+                     f"({this_session['hits']} hits, {this_session['misses']} misses)")
 
 if __name__ == "__main__":
     create_streamlit_app()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Re-parse archived Play Store pages with the current parser
+Use it after fixing the selectors: every page in the archive (see page_archive.py) is parsed
+again, spread over all CPU cores, and reviews that weren't found before are added to the review store
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import app_review_scraper as scraper
+from page_archive import DEFAULT_ARCHIVE_DIR, PageArchive, play_store_target
+from review_store import DEFAULT_STORE_PATH, ReviewStore
+
+
+def parse_archived_page(job):
+    """
+    Worker: parse one archived page - job is (archive folder, page hash)
+    """
+    root, page_hash = job
+    reviews = scraper.parse_google_play_reviews(PageArchive(root).get(page_hash))
+    for review in reviews:
+        # Cheap to rebuild, no need to send it back to the main process
+        review.pop("text_forms", None)
+    return page_hash, reviews
+
+
+def target_label(app_id, locale):
+    """
+    Same label the dashboard uses for this app (from secrets.toml, or the Via Verde default),
+    so backfilled reviews line up with live ones
+    """
+    for target in scraper.get_review_targets():
+        if target["app_id"] == app_id and target.get("locale", "pt_PT") == locale:
+            return target["label"]
+    return f"{app_id} ({locale})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse archived Play Store pages again with the current parser")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_DIR, help="Archive folder")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="Review store to add the reviews to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be found")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.archive)
+
+    # One job per distinct Play Store page; the URL says which app and locale it belongs to
+    pages = {}
+    for fetch in archive.fetches():
+        app_id, locale = play_store_target(fetch["url"])
+        if app_id and fetch["page_hash"] not in pages:
+            pages[fetch["page_hash"]] = (app_id, locale)
+
+    print(f"📦 {len(pages)} distinct Play Store pages in {args.archive}")
+    if not pages:
+        return 0
+
+    start = time.perf_counter()
+    all_reviews = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for page_hash, reviews in executor.map(parse_archived_page, [(args.archive, h) for h in pages]):
+            app_id, locale = pages[page_hash]
+            for review in reviews:
+                review["app_id"] = app_id
+                review["locale"] = locale
+                review["source"] = target_label(app_id, locale)
+            flag = "⚠️" if not reviews else "  "
+            print(f"   {flag} {page_hash[:12]} {app_id} ({locale}): {len(reviews)} reviews")
+            all_reviews.extend(reviews)
+    print(f"⏱️ Parsed in {time.perf_counter() - start:.1f}s with {args.workers} processes")
+
+    if args.dry_run:
+        print(f"🔎 Found {len(all_reviews)} reviews (dry run, nothing saved)")
+        return 0
+
+    # Add to the store; only reviews it hasn't seen are analyzed and added to the totals
+    store = ReviewStore(args.store)
+    before = store.count()
+    scraper.analyze_reviews_incrementally(all_reviews, store)
+    print(f"✅ {store.count() - before} new reviews added to {args.store} ({len(all_reviews)} found)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
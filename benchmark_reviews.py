@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Via Verde review pipeline
+Times the parser and each analysis on fake Play Store pages (or saved real pages)
+and appends the results to a JSON history file so slowdowns are easy to spot
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from html import escape
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import app_review_scraper as scraper
+from review_text import text_forms
+
+HISTORY_FILE = "benchmark_history.json"
+DEFAULT_SIZES = [100, 10000, 100000]
+
+# Building blocks for fake reviews - a mix of the words the analyses look for
+OPENINGS = [
+    "A app funciona bem", "Péssimo serviço", "Muito bom", "Não funciona desde a última atualização",
+    "Excelente aplicação", "Demora imenso a abrir", "Recomendo a todos", "Cheio de erros",
+    "Simples e fácil de usar", "Terrível experiência", "The app works fine", "Constant crash on start"
+]
+MIDDLES = [
+    "para pagar portagens", "no estacionamento", "no carregamento elétrico", "com o pagamento por MB Way",
+    "na interface nova", "depois da atualização", "quando abro o menu", "para estacionar no centro",
+    "with my toll payments", "when parking downtown"
+]
+ENDINGS = [
+    "e já reportei o problema.", "e estou satisfeito.", "mas às vezes trava.", "é muito útil no dia a dia.",
+    "versão anterior era melhor.", "rápido e sem falhas.", "and I recommend it.", "it is really frustrating."
+]
+NAMES = ["Ana Silva", "João Santos", "Maria Costa", "Pedro Ferreira", "Rita Almeida", "Tiago Sousa", "Unknown"]
+PT_MONTHS = ["janeiro", "fevereiro", "março", "abril", "maio", "junho",
+             "julho", "agosto", "setembro", "outubro", "novembro", "dezembro"]
+
+
+def make_reviews(count, seed=42):
+    """
+    Build a list of review dicts with the same shape the scraper returns
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    reviews = []
+    for _ in range(count):
+        review_day = today - timedelta(days=rng.randint(0, 720))
+        reviews.append({
+            "rating": rng.choices([1, 2, 3, 4, 5], weights=[30, 10, 10, 15, 35])[0],
+            "review": f"{rng.choice(OPENINGS)} {rng.choice(MIDDLES)} {rng.choice(ENDINGS)}",
+            "date": f"{review_day.day} de {PT_MONTHS[review_day.month - 1]} de {review_day.year}",
+            "date_iso": review_day.isoformat(),
+            "os": "Android",
+            "reviewer_name": rng.choice(NAMES),
+            "useful_count": rng.randint(0, 150)
+        })
+    return reviews
+
+
+def make_play_store_html(reviews):
+    """
+    Render reviews with the same classes the real Play Store page uses
+    """
+    blocks = []
+    for review in reviews:
+        blocks.append(
+            '<div class="EGFGHd">'
+            f'<div class="X5PpBb">{escape(review["reviewer_name"])}</div>'
+            '<div class="Jx4nYe">'
+            f'<div role="img" aria-label="Classificação: {review["rating"]} estrelas de cinco"></div>'
+            f'<span class="bp9Aid">{escape(review["date"])}</span>'
+            '</div>'
+            f'<div class="h3YV2d">{escape(review["review"])}</div>'
+            f'<div class="AJTPZc">Essa avaliação foi marcada como útil por {review["useful_count"]} pessoas</div>'
+            '</div>'
+        )
+    return f'<html><body><div class="reviews">{"".join(blocks)}</div></body></html>'
+
+
+def time_call(function, *args, repeat=1, **kwargs):
+    """
+    Run a function `repeat` times and return the best time in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare_keyword_analyzers(reviews, repeat=1):
+    """
+    Vocabulary size and TF-IDF fit time with every 1-3 word phrase (the old analyzer)
+    and with stopwords removed and words stemmed (the analyzer extract_keywords uses)
+    """
+    all_tokens = [text_forms(review)["tokens"] for review in reviews if text_forms(review)["has_text"]]
+    analyzers = {
+        "all phrases": lambda: scraper.keyword_terms,
+        "no stopwords + stems": scraper.KeywordAnalyzer
+    }
+
+    comparison = {}
+    for name, make_analyzer in analyzers.items():
+        fit_seconds = time_call(lambda: TfidfVectorizer(analyzer=make_analyzer()).fit(all_tokens), repeat=repeat)
+        vocabulary = len(TfidfVectorizer(analyzer=make_analyzer()).fit(all_tokens).vocabulary_)
+        comparison[name] = {"vocabulary": vocabulary, "fit_seconds": fit_seconds}
+        print(f"   TF-IDF {name:<21} {vocabulary:>8} terms {fit_seconds * 1000:>10.1f} ms")
+    return comparison
+
+
+def benchmark_corpus(label, reviews, html=None, repeat=1):
+    """
+    Time the parser (when there is HTML) and every analysis on one corpus
+    """
+    print(f"\n📊 {label}: {len(reviews)} reviews")
+    timings = {}
+
+    if html is not None:
+        timings["parse_google_play_reviews"] = time_call(scraper.parse_google_play_reviews, html, repeat=repeat)
+        parsed = scraper.parse_google_play_reviews(html)
+        if parsed:
+            reviews = parsed
+
+    timings["analyze_sentiment"] = time_call(scraper.analyze_sentiment, reviews, repeat=repeat)
+    timings["extract_keywords"] = time_call(scraper.extract_keywords, reviews, repeat=repeat)
+    timings["find_review_patterns"] = time_call(scraper.find_review_patterns, reviews, repeat=repeat)
+    timings["group_reviews_by_rating"] = time_call(scraper.group_reviews_by_rating, reviews, repeat=repeat)
+
+    for name, seconds in timings.items():
+        print(f"   {name:<28} {seconds * 1000:>10.1f} ms")
+
+    keyword_vocabulary = compare_keyword_analyzers(reviews, repeat=repeat)
+
+    return {"label": label, "reviews": len(reviews), "timings": timings, "keyword_vocabulary": keyword_vocabulary}
+
+
+def git_revision():
+    """
+    Current commit, so each history entry says which code was measured
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def load_history(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (json.JSONDecodeError, OSError):
+            print(f"⚠️ Could not read {path}, starting a new history")
+    return []
+
+
+def compare_with_previous(history, run):
+    """
+    Print how much each timing changed since the last run with the same corpus
+    """
+    for result in run["results"]:
+        previous = None
+        for old_run in reversed(history):
+            previous = next((r for r in old_run["results"] if r["label"] == result["label"]), None)
+            if previous:
+                break
+        if not previous:
+            continue
+
+        print(f"\n🔁 {result['label']} vs {previous.get('revision', 'previous run')}:")
+        for name, seconds in result["timings"].items():
+            old_seconds = previous["timings"].get(name)
+            if old_seconds:
+                change = (seconds - old_seconds) / old_seconds * 100
+                flag = "⚠️" if change > 10 else "  "
+                print(f"   {flag} {name:<28} {change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review scraper and analyses")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Number of synthetic reviews for each corpus")
+    parser.add_argument("--pages", nargs="*", default=[],
+                        help="Saved Play Store HTML pages to parse and analyze")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (best time is kept)")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON file where results are appended")
+    parser.add_argument("--no-save", action="store_true", help="Only print the results")
+    args = parser.parse_args()
+
+    print("Via Verde Review Benchmark")
+    print("=" * 30)
+
+    results = []
+    for size in args.sizes:
+        reviews = make_reviews(size)
+        results.append(benchmark_corpus(f"synthetic-{size}", reviews, make_play_store_html(reviews), args.repeat))
+
+    for page in args.pages:
+        with open(page, 'rb') as file:
+            html = file.read()
+        results.append(benchmark_corpus(f"page-{os.path.basename(page)}", [], html, args.repeat))
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results
+    }
+
+    history = load_history(args.history)
+    compare_with_previous(history, run)
+
+    if not args.no_save:
+        history.append(run)
+        with open(args.history, 'w', encoding='utf-8') as file:
+            json.dump(history, file, indent=2)
+        print(f"\n✅ Results saved to {args.history}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
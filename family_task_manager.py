@@ -1,7 +1,7 @@
 import streamlit as st
-import json
-import os
 from datetime import datetime
+from task_storage import open_task_storage
+from shared_tasks import SharedTaskStore, TaskConflictError
 
 # Page configuration
 st.set_page_config(
@@ -127,31 +127,29 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data storage functions
-def load_tasks():
-    """Load tasks from JSON file"""
-    if os.path.exists('tasks.json'):
-        try:
-            with open('tasks.json', 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+@st.cache_resource
+def get_task_store():
+    """Task list shared by all sessions, saved in tasks.json (or SQLite with TASKS_BACKEND=sqlite)"""
+    return SharedTaskStore(open_task_storage('tasks.json'))
 
-def save_tasks(tasks):
-    """Save tasks to JSON file"""
-    with open('tasks.json', 'w') as f:
-        json.dump(tasks, f, indent=2)
+def save_change(change, *args):
+    """Apply a change to the shared task list; warns and returns False if someone else changed the task first"""
+    try:
+        change(*args)
+        return True
+    except TaskConflictError as e:
+        st.warning(f"⚠️ {e}")
+        return False
 
-def get_next_id(tasks):
-    """Get the next available ID for a new task"""
-    if not tasks:
-        return 1
-    return max(task['id'] for task in tasks) + 1
+# The shared task list (tasks are only changed through the store)
+store = get_task_store()
+tasks_version = store.version
 
-# Initialize session state
-if 'tasks' not in st.session_state:
-    st.session_state.tasks = load_tasks()
+# Changes are checked against the version this session showed before the click
+seen_version = st.session_state.get('tasks_version', tasks_version)
+st.session_state.tasks_version = tasks_version
 
+# Initialize session state
 if 'show_form' not in st.session_state:
     st.session_state.show_form = False
 
@@ -170,11 +168,11 @@ with st.sidebar:
         st.session_state.editing_task = None
     
     # Task statistics
-    if st.session_state.tasks:
-        total_tasks = len(st.session_state.tasks)
-        open_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Open'])
-        progress_tasks = len([t for t in st.session_state.tasks if t['status'] == 'In Progress'])
-        done_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Done'])
+    if len(store):
+        total_tasks = len(store)
+        open_tasks = store.count('status', 'Open')
+        progress_tasks = store.count('status', 'In Progress')
+        done_tasks = store.count('status', 'Done')
         
         st.subheader("📊 Task Statistics")
         st.metric("Total Tasks", total_tasks)
@@ -190,7 +188,10 @@ if st.session_state.show_form:
         # Get current task data if editing
         current_task = None
         if st.session_state.editing_task:
-            current_task = next((t for t in st.session_state.tasks if t['id'] == st.session_state.editing_task), None)
+            # Keep the task as it was when the form opened, so only the fields changed here are saved
+            if st.session_state.get('editing_original', ({}, 0))[0].get('id') != st.session_state.editing_task:
+                st.session_state.editing_original = (store.get(st.session_state.editing_task) or {}, tasks_version)
+            current_task, form_seen_version = st.session_state.editing_original
         
         col1, col2 = st.columns(2)
         
@@ -213,47 +214,44 @@ if st.session_state.show_form:
             elif not responsible.strip():
                 st.error("Please enter a responsible person!")
             else:
+                form_values = {
+                    'title': title.strip(),
+                    'description': description.strip(),
+                    'responsible': responsible.strip(),
+                    'priority': priority,
+                    'status': status
+                }
                 if st.session_state.editing_task:
-                    # Update existing task
-                    for task in st.session_state.tasks:
-                        if task['id'] == st.session_state.editing_task:
-                            task.update({
-                                'title': title.strip(),
-                                'description': description.strip(),
-                                'responsible': responsible.strip(),
-                                'priority': priority,
-                                'status': status
-                            })
-                            break
-                    st.success("Task updated successfully!")
+                    # Update existing task (only the fields changed in the form)
+                    changes = {field: value for field, value in form_values.items() if current_task.get(field) != value}
+                    saved = not changes or save_change(store.update, st.session_state.editing_task, changes, form_seen_version)
+                    if saved:
+                        st.success("Task updated successfully!")
                 else:
                     # Create new task
-                    new_task = {
-                        'id': get_next_id(st.session_state.tasks),
-                        'title': title.strip(),
-                        'description': description.strip(),
-                        'responsible': responsible.strip(),
-                        'priority': priority,
-                        'status': status,
-                        'created_at': datetime.now().isoformat()
-                    }
-                    st.session_state.tasks.append(new_task)
+                    store.add(dict(form_values, created_at=datetime.now().isoformat()))
+                    saved = True
                     st.success("Task created successfully!")
                 
-                save_tasks(st.session_state.tasks)
-                st.session_state.show_form = False
-                st.session_state.editing_task = None
-                st.rerun()
+                if saved:
+                    st.session_state.show_form = False
+                    st.session_state.editing_task = None
+                    st.session_state.pop('editing_original', None)
+                    st.rerun()
+                else:
+                    # Show the latest version of the task in the form next time
+                    st.session_state.pop('editing_original', None)
     
     if st.button("❌ Cancel", use_container_width=True):
         st.session_state.show_form = False
         st.session_state.editing_task = None
+        st.session_state.pop('editing_original', None)
         st.rerun()
 
 # Kanban Board
 st.subheader("📋 Task Board")
 
-if not st.session_state.tasks:
+if not len(store):
     st.info("🎉 No tasks yet! Click 'Add New Task' in the sidebar to get started.")
 else:
     # Create three columns for the Kanban board using Streamlit's native columns
@@ -264,7 +262,7 @@ else:
         st.markdown('<div class="kanban-container open-container">', unsafe_allow_html=True)
         st.markdown('<div class="column-header">🟢 Open Tasks</div>', unsafe_allow_html=True)
         
-        open_tasks = [task for task in st.session_state.tasks if task['status'] == 'Open']
+        open_tasks = store.find(status='Open')
         for task in open_tasks:
             # Display task information using Streamlit components
             with st.container():
@@ -278,9 +276,8 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("➡️", key=f"move_progress_{task['id']}", help="Move to In Progress"):
-                        task['status'] = 'In Progress'
-                        save_tasks(st.session_state.tasks)
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'In Progress', seen_version):
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -289,10 +286,9 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.rerun()
@@ -301,10 +297,9 @@ else:
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     st.warning(f"⚠️ Delete '{task['title']}'?")
                     if st.button("✅ Confirm Delete", key=f"confirm_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -318,7 +313,7 @@ else:
         st.markdown('<div class="kanban-container progress-container">', unsafe_allow_html=True)
         st.markdown('<div class="column-header">🟡 In Progress</div>', unsafe_allow_html=True)
         
-        progress_tasks = [task for task in st.session_state.tasks if task['status'] == 'In Progress']
+        progress_tasks = store.find(status='In Progress')
         for task in progress_tasks:
             # Display task information using Streamlit components
             with st.container():
@@ -332,9 +327,8 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("✅", key=f"move_done_{task['id']}", help="Move to Done"):
-                        task['status'] = 'Done'
-                        save_tasks(st.session_state.tasks)
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'Done', seen_version):
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_progress_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -343,10 +337,9 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_progress_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.rerun()
@@ -355,10 +348,9 @@ else:
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     st.warning(f"⚠️ Delete '{task['title']}'?")
                     if st.button("✅ Confirm Delete", key=f"confirm_progress_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_progress_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -372,7 +364,7 @@ else:
         st.markdown('<div class="kanban-container done-container">', unsafe_allow_html=True)
         st.markdown('<div class="column-header">✅ Done</div>', unsafe_allow_html=True)
         
-        done_tasks = [task for task in st.session_state.tasks if task['status'] == 'Done']
+        done_tasks = store.find(status='Done')
         for task in done_tasks:
             # Display task information using Streamlit components
             with st.container():
@@ -386,9 +378,8 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("⬅️", key=f"move_back_{task['id']}", help="Move back to In Progress"):
-                        task['status'] = 'In Progress'
-                        save_tasks(st.session_state.tasks)
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'In Progress', seen_version):
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_done_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -397,10 +388,9 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_done_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.rerun()
@@ -409,10 +399,9 @@ else:
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     st.warning(f"⚠️ Delete '{task['title']}'?")
                     if st.button("✅ Confirm Delete", key=f"confirm_done_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_done_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -1,7 +1,7 @@
 import streamlit as st
-import json
-import os
 from datetime import datetime
+from task_storage import open_task_storage
+from shared_tasks import SharedTaskStore, TaskConflictError
 from streamlit_kanban_board_goviceversa import kanban_board
 
 # Page configuration
@@ -79,19 +79,24 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data storage functions
-def load_tasks():
-    """Load tasks from JSON file"""
-    if os.path.exists('tasks.json'):
-        try:
-            with open('tasks.json', 'r') as f:
-                tasks = json.load(f)
-                if tasks and len(tasks) > 0:  # If file exists and has tasks, return them
-                    return tasks
-        except:
-            pass
-    
-    # If no file or empty file, return example family tasks
-    return get_example_family_tasks()
+@st.cache_resource
+def get_task_store():
+    """Task list shared by all sessions, saved in tasks.json (or SQLite with TASKS_BACKEND=sqlite)"""
+    store = SharedTaskStore(open_task_storage('tasks.json'))
+    if not store.storage.existed:
+        # First start, nothing was ever saved: begin with the example family tasks
+        # (a list emptied with "Delete All Tasks" stays empty)
+        store.replace_all(get_example_family_tasks())
+    return store
+
+def save_change(change, *args):
+    """Apply a change to the shared task list; warns and returns False if someone else changed the task first"""
+    try:
+        change(*args)
+        return True
+    except TaskConflictError as e:
+        st.warning(f"⚠️ {e}")
+        return False
 
 def get_example_family_tasks():
     """Get example family tasks for demonstration"""
@@ -152,31 +157,13 @@ def get_example_family_tasks():
         }
     ]
 
-def save_tasks(tasks):
-    """Save tasks to JSON file"""
-    with open('tasks.json', 'w') as f:
-        json.dump(tasks, f, indent=2)
-
-def get_next_id(tasks):
-    """Get the next available ID for a new task"""
-    if not tasks:
-        return 1
-    return max(task['id'] for task in tasks) + 1
-
-def filter_tasks(tasks, stage_filter, priority_filter, responsible_filter):
-    """Filter tasks based on the selected criteria"""
-    filtered_tasks = tasks.copy()
-    
-    if stage_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['status'] == stage_filter]
-    
-    if priority_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['priority'] == priority_filter]
-    
-    if responsible_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['responsible'] == responsible_filter]
-    
-    return filtered_tasks
+def filter_tasks(store, stage_filter, priority_filter, responsible_filter):
+    """Filter tasks based on the selected criteria ("All" means any value)"""
+    return store.find(
+        status=None if stage_filter == "All" else stage_filter,
+        priority=None if priority_filter == "All" else priority_filter,
+        responsible=None if responsible_filter == "All" else responsible_filter
+    )
 
 def convert_tasks_to_kanban_format(tasks):
     """Convert tasks to the format required by streamlit-kanban-board-goviceversa"""
@@ -224,8 +211,9 @@ def convert_tasks_to_kanban_format(tasks):
     
     return kanban_deals
 
-def update_task_status_from_kanban(kanban_result, tasks):
-    """Update task status based on kanban board changes"""
+def update_task_status_from_kanban(kanban_result, store):
+    """Find the tasks moved on the kanban board: returns {task id: new status}"""
+    moves = {}
     if kanban_result:
         # Handle different possible return formats
         try:
@@ -251,11 +239,10 @@ def update_task_status_from_kanban(kanban_result, tasks):
                         
                         new_status = stage_to_status.get(new_stage, "Open")
                         
-                        # Find and update the task
-                        for task in tasks:
-                            if task['id'] == task_id:
-                                task['status'] = new_status
-                                break
+                        # Remember the move if the task's status changed
+                        task = store.get(task_id)
+                        if task and task['status'] != new_status:
+                            moves[task_id] = new_status
             elif isinstance(kanban_result, dict):
                 # Handle single dictionary result
                 deal_id = kanban_result.get('deal_id', '')
@@ -275,11 +262,10 @@ def update_task_status_from_kanban(kanban_result, tasks):
                 
                 new_status = stage_to_status.get(new_stage, "Open")
                 
-                # Find and update the task
-                for task in tasks:
-                    if task['id'] == task_id:
-                        task['status'] = new_status
-                        break
+                # Remember the move if the task's status changed
+                task = store.get(task_id)
+                if task and task['status'] != new_status:
+                    moves[task_id] = new_status
             else:
                 # If it's neither list nor dict, log it but don't error
                 st.write(f"Kanban result type: {type(kanban_result)}")
@@ -287,12 +273,17 @@ def update_task_status_from_kanban(kanban_result, tasks):
         except Exception as e:
             st.warning(f"Could not process kanban result: {e}")
     
-    return tasks
+    return moves
 
-# Initialize session state
-if 'tasks' not in st.session_state:
-    st.session_state.tasks = load_tasks()
+# The shared task list (tasks are only changed through the store)
+store = get_task_store()
+tasks_version = store.version
+
+# Changes are checked against the version this session showed before the click
+seen_version = st.session_state.get('tasks_version', tasks_version)
+st.session_state.tasks_version = tasks_version
 
+# Initialize session state
 if 'show_form' not in st.session_state:
     st.session_state.show_form = False
 
@@ -318,7 +309,7 @@ col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
 
 with col1:
     # Stage filter
-    stages = ["All"] + list(set([task['status'] for task in st.session_state.tasks]))
+    stages = ["All"] + store.values('status')
     if st.session_state.filter_stage in stages:
         current_stage_index = stages.index(st.session_state.filter_stage)
     else:
@@ -327,7 +318,7 @@ with col1:
 
 with col2:
     # Priority filter
-    priorities = ["All"] + list(set([task['priority'] for task in st.session_state.tasks]))
+    priorities = ["All"] + store.values('priority')
     if st.session_state.filter_priority in priorities:
         current_priority_index = priorities.index(st.session_state.filter_priority)
     else:
@@ -336,7 +327,7 @@ with col2:
 
 with col3:
     # Responsible person filter
-    responsible_people = ["All"] + list(set([task['responsible'] for task in st.session_state.tasks]))
+    responsible_people = ["All"] + store.values('responsible')
     if st.session_state.filter_responsible in responsible_people:
         current_responsible_index = responsible_people.index(st.session_state.filter_responsible)
     else:
@@ -365,11 +356,11 @@ with st.sidebar:
     
     
     # Task statistics
-    if st.session_state.tasks:
-        total_tasks = len(st.session_state.tasks)
-        open_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Open'])
-        progress_tasks = len([t for t in st.session_state.tasks if t['status'] == 'In Progress'])
-        done_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Done'])
+    if len(store):
+        total_tasks = len(store)
+        open_tasks = store.count('status', 'Open')
+        progress_tasks = store.count('status', 'In Progress')
+        done_tasks = store.count('status', 'Done')
         
         st.subheader("📊 Task Statistics")
         st.metric("Total Tasks", total_tasks)
@@ -381,15 +372,13 @@ with st.sidebar:
     st.subheader("🔧 Management")
     
     if st.button("🎯 Load Example Tasks", use_container_width=True):
-        st.session_state.tasks = get_example_family_tasks()
-        save_tasks(st.session_state.tasks)
+        store.replace_all(get_example_family_tasks())
         st.success("Example family tasks loaded!")
         st.rerun()
     
     if st.button("🗑️ Delete All Tasks", use_container_width=True):
         if st.session_state.get("confirm_delete_all", False):
-            st.session_state.tasks = []
-            save_tasks(st.session_state.tasks)
+            store.replace_all([])
             st.session_state["confirm_delete_all"] = False
             st.success("All tasks deleted!")
             st.rerun()
@@ -400,8 +389,7 @@ with st.sidebar:
     
     if st.session_state.get("confirm_delete_all", False):
         if st.button("✅ Confirm Delete All", use_container_width=True):
-            st.session_state.tasks = []
-            save_tasks(st.session_state.tasks)
+            store.replace_all([])
             st.session_state["confirm_delete_all"] = False
             st.success("All tasks deleted!")
             st.rerun()
@@ -417,7 +405,10 @@ if st.session_state.show_form:
         # Get current task data if editing
         current_task = None
         if st.session_state.editing_task:
-            current_task = next((t for t in st.session_state.tasks if t['id'] == st.session_state.editing_task), None)
+            # Keep the task as it was when the form opened, so only the fields changed here are saved
+            if st.session_state.get('editing_original', ({}, 0))[0].get('id') != st.session_state.editing_task:
+                st.session_state.editing_original = (store.get(st.session_state.editing_task) or {}, tasks_version)
+            current_task, form_seen_version = st.session_state.editing_original
         
         col1, col2 = st.columns(2)
         
@@ -440,53 +431,50 @@ if st.session_state.show_form:
             elif not responsible.strip():
                 st.error("Please enter a responsible person!")
             else:
+                form_values = {
+                    'title': title.strip(),
+                    'description': description.strip(),
+                    'responsible': responsible.strip(),
+                    'priority': priority,
+                    'status': status
+                }
                 if st.session_state.editing_task:
-                    # Update existing task
-                    for task in st.session_state.tasks:
-                        if task['id'] == st.session_state.editing_task:
-                            task.update({
-                                'title': title.strip(),
-                                'description': description.strip(),
-                                'responsible': responsible.strip(),
-                                'priority': priority,
-                                'status': status
-                            })
-                            break
-                    st.success("Task updated successfully!")
+                    # Update existing task (only the fields changed in the form)
+                    changes = {field: value for field, value in form_values.items() if current_task.get(field) != value}
+                    saved = not changes or save_change(store.update, st.session_state.editing_task, changes, form_seen_version)
+                    if saved:
+                        st.success("Task updated successfully!")
                 else:
                     # Create new task
-                    new_task = {
-                        'id': get_next_id(st.session_state.tasks),
-                        'title': title.strip(),
-                        'description': description.strip(),
-                        'responsible': responsible.strip(),
-                        'priority': priority,
-                        'status': status,
-                        'created_at': datetime.now().isoformat()
-                    }
-                    st.session_state.tasks.append(new_task)
+                    store.add(dict(form_values, created_at=datetime.now().isoformat()))
+                    saved = True
                     st.success("Task created successfully!")
                 
-                save_tasks(st.session_state.tasks)
-                st.session_state.show_form = False
-                st.session_state.editing_task = None
-                st.rerun()
+                if saved:
+                    st.session_state.show_form = False
+                    st.session_state.editing_task = None
+                    st.session_state.pop('editing_original', None)
+                    st.rerun()
+                else:
+                    # Show the latest version of the task in the form next time
+                    st.session_state.pop('editing_original', None)
     
     if st.button("❌ Cancel", use_container_width=True):
         st.session_state.show_form = False
         st.session_state.editing_task = None
+        st.session_state.pop('editing_original', None)
         st.rerun()
 
 
 # Kanban Board
 st.subheader("📋 Task Board")
 
-if not st.session_state.tasks:
+if not len(store):
     st.info("🎉 No tasks yet! Click 'Add New Task' in the sidebar to get started.")
 else:
     # Apply filters to tasks
     filtered_tasks = filter_tasks(
-        st.session_state.tasks,
+        store,
         st.session_state.filter_stage,
         st.session_state.filter_priority,
         st.session_state.filter_responsible
@@ -510,23 +498,22 @@ else:
         
         # Handle kanban board changes - re-enabled with better error handling
         if kanban_result:
-            # Update tasks based on kanban changes
-            updated_tasks = update_task_status_from_kanban(kanban_result, st.session_state.tasks)
-            st.session_state.tasks = updated_tasks
-            save_tasks(st.session_state.tasks)
-            st.success("✅ Task moved successfully!")
-            st.rerun()
+            # Save only the tasks that were moved to another stage
+            moves = update_task_status_from_kanban(kanban_result, store)
+            if all([save_change(store.move, task_id, status, seen_version) for task_id, status in moves.items()]):
+                st.success("✅ Task moved successfully!")
+                st.rerun()
     
     # Display task management options below the kanban board
     st.subheader("🔧 Task Management")
     
     # Create a detailed task list for editing and deleting
-    if st.session_state.tasks:
+    if len(store):
         st.write("**📋 Task Details & Management**")
         st.write("Use the Kanban board above to move tasks between stages. Use the details below to edit or delete tasks.")
         
         # Use filtered tasks for the management section too
-        management_tasks = filtered_tasks if 'filtered_tasks' in locals() else st.session_state.tasks
+        management_tasks = filtered_tasks if 'filtered_tasks' in locals() else store.find()
         
         for task in management_tasks:
             priority_emoji = {"High": "🔴", "Medium": "🟡", "Low": "🟢"}
@@ -551,10 +538,9 @@ else:
                     
                     if new_status != task['status']:
                         if st.button(f"Update to {new_status}", key=f"update_status_{task['id']}"):
-                            task['status'] = new_status
-                            save_tasks(st.session_state.tasks)
-                            st.success(f"Task status updated to {new_status}!")
-                            st.rerun()
+                            if save_change(store.move, task['id'], new_status, seen_version):
+                                st.success(f"Task status updated to {new_status}!")
+                                st.rerun()
                 
                 with col2:
                     if st.button("✏️ Edit", key=f"edit_task_{task['id']}"):
@@ -564,11 +550,10 @@ else:
                     
                     if st.button("🗑️ Delete", key=f"delete_task_{task['id']}"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.success(f"Task '{task['title']}' deleted!")
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.success(f"Task '{task['title']}' deleted!")
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.warning(f"⚠️ Delete '{task['title']}'?")
@@ -576,11 +561,10 @@ else:
                 
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     if st.button("✅ Confirm Delete", key=f"confirm_delete_task_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.success(f"Task '{task['title']}' deleted!")
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.success(f"Task '{task['title']}' deleted!")
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_delete_task_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -1,7 +1,7 @@
 import streamlit as st
-import json
-import os
 from datetime import datetime
+from task_storage import open_task_storage
+from shared_tasks import SharedTaskStore, TaskConflictError
 
 # Page configuration
 st.set_page_config(
@@ -137,19 +137,24 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data storage functions
-def load_tasks():
-    """Load tasks from JSON file"""
-    if os.path.exists('tasks_pt.json'):
-        try:
-            with open('tasks_pt.json', 'r') as f:
-                tasks = json.load(f)
-                if tasks and len(tasks) > 0:  # If file exists and has tasks, return them
-                    return tasks
-        except:
-            pass
-    
-    # If no file or empty file, return example family tasks
-    return get_example_family_tasks()
+@st.cache_resource
+def get_task_store():
+    """Task list shared by all sessions, saved in tasks_pt.json (or SQLite with TASKS_BACKEND=sqlite)"""
+    store = SharedTaskStore(open_task_storage('tasks_pt.json'))
+    if not store.storage.existed:
+        # First start, nothing was ever saved: begin with the example family tasks
+        # (a list emptied with "Delete All Tasks" stays empty)
+        store.replace_all(get_example_family_tasks())
+    return store
+
+def save_change(change, *args):
+    """Apply a change to the shared task list; warns and returns False if someone else changed the task first"""
+    try:
+        change(*args)
+        return True
+    except TaskConflictError as e:
+        st.warning(f"⚠️ {e}")
+        return False
 
 def get_example_family_tasks():
     """Get example family tasks for demonstration"""
@@ -210,36 +215,23 @@ def get_example_family_tasks():
         }
     ]
 
-def save_tasks(tasks):
-    """Save tasks to JSON file"""
-    with open('tasks_pt.json', 'w') as f:
-        json.dump(tasks, f, indent=2)
+def filter_tasks(store, stage_filter, priority_filter, responsible_filter):
+    """Filter tasks based on the selected criteria ("All" means any value)"""
+    return store.find(
+        status=None if stage_filter == "All" else stage_filter,
+        priority=None if priority_filter == "All" else priority_filter,
+        responsible=None if responsible_filter == "All" else responsible_filter
+    )
 
-def get_next_id(tasks):
-    """Get the next available ID for a new task"""
-    if not tasks:
-        return 1
-    return max(task['id'] for task in tasks) + 1
+# The shared task list (tasks are only changed through the store)
+store = get_task_store()
+tasks_version = store.version
 
-def filter_tasks(tasks, stage_filter, priority_filter, responsible_filter):
-    """Filter tasks based on the selected criteria"""
-    filtered_tasks = tasks.copy()
-    
-    if stage_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['status'] == stage_filter]
-    
-    if priority_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['priority'] == priority_filter]
-    
-    if responsible_filter != "All":
-        filtered_tasks = [task for task in filtered_tasks if task['responsible'] == responsible_filter]
-    
-    return filtered_tasks
+# Changes are checked against the version this session showed before the click
+seen_version = st.session_state.get('tasks_version', tasks_version)
+st.session_state.tasks_version = tasks_version
 
 # Initialize session state
-if 'tasks' not in st.session_state:
-    st.session_state.tasks = load_tasks()
-
 if 'show_form' not in st.session_state:
     st.session_state.show_form = False
 
@@ -265,7 +257,7 @@ col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
 
 with col1:
     # Stage filter
-    stages = ["All"] + list(set([task['status'] for task in st.session_state.tasks]))
+    stages = ["All"] + store.values('status')
     if st.session_state.filter_stage in stages:
         current_stage_index = stages.index(st.session_state.filter_stage)
     else:
@@ -274,7 +266,7 @@ with col1:
 
 with col2:
     # Priority filter
-    priorities = ["All"] + list(set([task['priority'] for task in st.session_state.tasks]))
+    priorities = ["All"] + store.values('priority')
     if st.session_state.filter_priority in priorities:
         current_priority_index = priorities.index(st.session_state.filter_priority)
     else:
@@ -283,7 +275,7 @@ with col2:
 
 with col3:
     # Responsible person filter
-    responsible_people = ["All"] + list(set([task['responsible'] for task in st.session_state.tasks]))
+    responsible_people = ["All"] + store.values('responsible')
     if st.session_state.filter_responsible in responsible_people:
         current_responsible_index = responsible_people.index(st.session_state.filter_responsible)
     else:
@@ -311,11 +303,11 @@ with st.sidebar:
         st.session_state.editing_task = None
     
     # Task statistics
-    if st.session_state.tasks:
-        total_tasks = len(st.session_state.tasks)
-        open_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Open'])
-        progress_tasks = len([t for t in st.session_state.tasks if t['status'] == 'In Progress'])
-        done_tasks = len([t for t in st.session_state.tasks if t['status'] == 'Done'])
+    if len(store):
+        total_tasks = len(store)
+        open_tasks = store.count('status', 'Open')
+        progress_tasks = store.count('status', 'In Progress')
+        done_tasks = store.count('status', 'Done')
         
         st.subheader("📊 Task Statistics")
         st.metric("Total Tasks", total_tasks)
@@ -327,15 +319,13 @@ with st.sidebar:
     st.subheader("🔧 Management")
     
     if st.button("🎯 Load Example Tasks", use_container_width=True):
-        st.session_state.tasks = get_example_family_tasks()
-        save_tasks(st.session_state.tasks)
+        store.replace_all(get_example_family_tasks())
         st.success("Example family tasks loaded!")
         st.rerun()
     
     if st.button("🗑️ Delete All Tasks", use_container_width=True):
         if st.session_state.get("confirm_delete_all", False):
-            st.session_state.tasks = []
-            save_tasks(st.session_state.tasks)
+            store.replace_all([])
             st.session_state["confirm_delete_all"] = False
             st.success("All tasks deleted!")
             st.rerun()
@@ -346,8 +336,7 @@ with st.sidebar:
     
     if st.session_state.get("confirm_delete_all", False):
         if st.button("✅ Confirm Delete All", use_container_width=True):
-            st.session_state.tasks = []
-            save_tasks(st.session_state.tasks)
+            store.replace_all([])
             st.session_state["confirm_delete_all"] = False
             st.success("All tasks deleted!")
             st.rerun()
@@ -363,7 +352,10 @@ if st.session_state.show_form:
         # Get current task data if editing
         current_task = None
         if st.session_state.editing_task:
-            current_task = next((t for t in st.session_state.tasks if t['id'] == st.session_state.editing_task), None)
+            # Keep the task as it was when the form opened, so only the fields changed here are saved
+            if st.session_state.get('editing_original', ({}, 0))[0].get('id') != st.session_state.editing_task:
+                st.session_state.editing_original = (store.get(st.session_state.editing_task) or {}, tasks_version)
+            current_task, form_seen_version = st.session_state.editing_original
         
         col1, col2 = st.columns(2)
         
@@ -386,52 +378,49 @@ if st.session_state.show_form:
             elif not responsible.strip():
                 st.error("Please enter a responsible person!")
             else:
+                form_values = {
+                    'title': title.strip(),
+                    'description': description.strip(),
+                    'responsible': responsible.strip(),
+                    'priority': priority,
+                    'status': status
+                }
                 if st.session_state.editing_task:
-                    # Update existing task
-                    for task in st.session_state.tasks:
-                        if task['id'] == st.session_state.editing_task:
-                            task.update({
-                                'title': title.strip(),
-                                'description': description.strip(),
-                                'responsible': responsible.strip(),
-                                'priority': priority,
-                                'status': status
-                            })
-                            break
-                    st.success("Task updated successfully!")
+                    # Update existing task (only the fields changed in the form)
+                    changes = {field: value for field, value in form_values.items() if current_task.get(field) != value}
+                    saved = not changes or save_change(store.update, st.session_state.editing_task, changes, form_seen_version)
+                    if saved:
+                        st.success("Task updated successfully!")
                 else:
                     # Create new task
-                    new_task = {
-                        'id': get_next_id(st.session_state.tasks),
-                        'title': title.strip(),
-                        'description': description.strip(),
-                        'responsible': responsible.strip(),
-                        'priority': priority,
-                        'status': status,
-                        'created_at': datetime.now().isoformat()
-                    }
-                    st.session_state.tasks.append(new_task)
+                    store.add(dict(form_values, created_at=datetime.now().isoformat()))
+                    saved = True
                     st.success("Task created successfully!")
                 
-                save_tasks(st.session_state.tasks)
-                st.session_state.show_form = False
-                st.session_state.editing_task = None
-                st.rerun()
+                if saved:
+                    st.session_state.show_form = False
+                    st.session_state.editing_task = None
+                    st.session_state.pop('editing_original', None)
+                    st.rerun()
+                else:
+                    # Show the latest version of the task in the form next time
+                    st.session_state.pop('editing_original', None)
     
     if st.button("❌ Cancel", use_container_width=True):
         st.session_state.show_form = False
         st.session_state.editing_task = None
+        st.session_state.pop('editing_original', None)
         st.rerun()
 
 # Kanban Board using native Streamlit components
 st.subheader("📋 Task Board")
 
-if not st.session_state.tasks:
+if not len(store):
     st.info("🎉 No tasks yet! Click 'Add New Task' in the sidebar to get started.")
 else:
     # Apply filters to tasks
     filtered_tasks = filter_tasks(
-        st.session_state.tasks,
+        store,
         st.session_state.filter_stage,
         st.session_state.filter_priority,
         st.session_state.filter_responsible
@@ -473,10 +462,9 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("➡️", key=f"move_progress_{task['id']}", help="Move to In Progress"):
-                        task['status'] = 'In Progress'
-                        save_tasks(st.session_state.tasks)
-                        st.success("Task moved to In Progress!")
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'In Progress', seen_version):
+                            st.success("Task moved to In Progress!")
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -485,11 +473,10 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.success(f"Task '{task['title']}' deleted!")
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.success(f"Task '{task['title']}' deleted!")
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.warning(f"⚠️ Delete '{task['title']}'?")
@@ -498,11 +485,10 @@ else:
                 # Confirmation prompt
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     if st.button("✅ Confirm Delete", key=f"confirm_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.success(f"Task '{task['title']}' deleted!")
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.success(f"Task '{task['title']}' deleted!")
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -541,10 +527,9 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("✅", key=f"move_done_{task['id']}", help="Move to Done"):
-                        task['status'] = 'Done'
-                        save_tasks(st.session_state.tasks)
-                        st.success("Task moved to Done!")
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'Done', seen_version):
+                            st.success("Task moved to Done!")
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_progress_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -553,11 +538,10 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_progress_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.success(f"Task '{task['title']}' deleted!")
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.success(f"Task '{task['title']}' deleted!")
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.warning(f"⚠️ Delete '{task['title']}'?")
@@ -566,11 +550,10 @@ else:
                 # Confirmation prompt
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     if st.button("✅ Confirm Delete", key=f"confirm_progress_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.success(f"Task '{task['title']}' deleted!")
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.success(f"Task '{task['title']}' deleted!")
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_progress_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -609,10 +592,9 @@ else:
                 btn_col1, btn_col2, btn_col3 = st.columns(3)
                 with btn_col1:
                     if st.button("⬅️", key=f"move_back_{task['id']}", help="Move back to In Progress"):
-                        task['status'] = 'In Progress'
-                        save_tasks(st.session_state.tasks)
-                        st.success("Task moved back to In Progress!")
-                        st.rerun()
+                        if save_change(store.move, task['id'], 'In Progress', seen_version):
+                            st.success("Task moved back to In Progress!")
+                            st.rerun()
                 with btn_col2:
                     if st.button("✏️", key=f"edit_done_{task['id']}", help="Edit Task"):
                         st.session_state.editing_task = task['id']
@@ -621,11 +603,10 @@ else:
                 with btn_col3:
                     if st.button("🗑️", key=f"delete_done_{task['id']}", help="Delete Task"):
                         if st.session_state.get(f"confirm_delete_{task['id']}", False):
-                            st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                            save_tasks(st.session_state.tasks)
                             st.session_state[f"confirm_delete_{task['id']}"] = False
-                            st.success(f"Task '{task['title']}' deleted!")
-                            st.rerun()
+                            if save_change(store.delete, task['id'], seen_version):
+                                st.success(f"Task '{task['title']}' deleted!")
+                                st.rerun()
                         else:
                             st.session_state[f"confirm_delete_{task['id']}"] = True
                             st.warning(f"⚠️ Delete '{task['title']}'?")
@@ -634,11 +615,10 @@ else:
                 # Confirmation prompt
                 if st.session_state.get(f"confirm_delete_{task['id']}", False):
                     if st.button("✅ Confirm Delete", key=f"confirm_done_{task['id']}"):
-                        st.session_state.tasks = [t for t in st.session_state.tasks if t['id'] != task['id']]
-                        save_tasks(st.session_state.tasks)
                         st.session_state[f"confirm_delete_{task['id']}"] = False
-                        st.success(f"Task '{task['title']}' deleted!")
-                        st.rerun()
+                        if save_change(store.delete, task['id'], seen_version):
+                            st.success(f"Task '{task['title']}' deleted!")
+                            st.rerun()
                     if st.button("❌ Cancel", key=f"cancel_done_{task['id']}"):
                         st.session_state[f"confirm_delete_{task['id']}"] = False
                         st.rerun()
@@ -0,0 +1,152 @@
+"""
+Small extraction engine for the HTML scrapers
+Describe what to pull out of a page (a list of container selectors to try in order,
+plus the fields inside each container) and the selectors are compiled once and reused
+"""
+
+import re
+
+import soupsieve as sv
+from bs4.element import Tag
+
+
+class Field:
+    """
+    One value to read from a container
+
+    selectors: CSS selectors tried in order, the first element found wins
+    attr: read this attribute instead of the element text
+    process: function applied to the raw value (its result None means "use the default")
+    fallback: function(container) used when no selector finds anything
+    include_self: also accept the container itself when it matches the selector
+    strip: join the text of child elements without spaces, trimming each piece (BeautifulSoup's strip=True)
+    every_match: try every element the selectors find, in order, until `process` gives a value
+      (e.g. the first "estrelas" label that has a number in it), instead of only the first element
+    """
+
+    def __init__(self, selectors, attr=None, process=None, default=None, fallback=None, include_self=False, strip=True,
+                 every_match=False):
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        self.selectors = list(selectors)
+        self.compiled = [sv.compile(selector) for selector in self.selectors]
+        self.attr = attr
+        self.process = process
+        self.default = default
+        self.fallback = fallback
+        self.include_self = include_self
+        self.strip = strip
+        self.every_match = every_match
+
+    def find(self, container):
+        for compiled in self.compiled:
+            if self.include_self and compiled.match(container):
+                return container
+            element = compiled.select_one(container)
+            if element is not None:
+                return element
+        return None
+
+    def find_all(self, container):
+        """
+        Every element the selectors find, selector by selector
+        """
+        for compiled in self.compiled:
+            if self.include_self and compiled.match(container):
+                yield container
+            yield from compiled.select(container)
+
+    def _value(self, element):
+        value = element.get(self.attr) if self.attr else element.get_text(strip=self.strip)
+        if value is not None and self.process:
+            value = self.process(value)
+        return value
+
+    def extract(self, container):
+        value = None
+        if self.every_match:
+            found = False
+            for element in self.find_all(container):
+                found = True
+                value = self._value(element)
+                if value is not None:
+                    break
+        else:
+            element = self.find(container)
+            found = element is not None
+            if found:
+                value = self._value(element)
+
+        if not found:
+            value = self.fallback(container) if self.fallback else None
+            if value is not None and self.process:
+                value = self.process(value)
+        return self.default if value is None else value
+
+
+class ContainerMatch:
+    """
+    Result of looking for containers: which selector won and what it found
+    """
+
+    def __init__(self, selector, containers):
+        self.selector = selector
+        self.containers = containers
+
+    def __bool__(self):
+        return bool(self.containers)
+
+
+class ExtractionSchema:
+    """
+    A container selector cascade plus the fields to read from each container
+    """
+
+    def __init__(self, containers, fields=None):
+        self.container_selectors = list(containers)
+        self.compiled_containers = [sv.compile(selector) for selector in self.container_selectors]
+        self.fields = fields or {}
+
+    def find_containers(self, root):
+        """
+        Walk the page once and return the matches of the first selector (in cascade order)
+        that matches anything. Once a selector has matched, later ones are not tested anymore.
+        """
+        best = None
+        found = []
+        for element in root.descendants:
+            if not isinstance(element, Tag):
+                continue
+            limit = len(self.compiled_containers) if best is None else best + 1
+            for index in range(limit):
+                if self.compiled_containers[index].match(element):
+                    if best is None or index < best:
+                        best = index
+                        found = []
+                    found.append(element)
+                    break
+
+        if best is None:
+            return ContainerMatch(None, [])
+        return ContainerMatch(self.container_selectors[best], found)
+
+    def extract_fields(self, container):
+        """
+        Read every field from one container into a dict
+        """
+        return {name: field.extract(container) for name, field in self.fields.items()}
+
+    def extract(self, root):
+        """
+        Find the containers and read their fields - returns (records, matched selector)
+        """
+        match = self.find_containers(root)
+        return [self.extract_fields(container) for container in match.containers], match.selector
+
+
+def first_number(text):
+    """
+    First whole number in a text ("Classificação: 4 estrelas" -> 4), or None
+    """
+    numbers = re.findall(r'\d+', text or '')
+    return int(numbers[0]) if numbers else None
@@ -0,0 +1,146 @@
+"""
+Record and replay HTTP calls for the review scraper
+Saves responses to small gzip "cassette" files so runs can be repeated offline
+
+Pick the mode with the REVIEW_HTTP_MODE environment variable:
+- live (default): normal network calls, nothing saved
+- record: normal network calls, every response saved to a cassette
+- replay: answers only from cassettes, never touches the network
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import requests
+
+MODES = ("live", "record", "replay")
+
+
+class CassetteMissError(Exception):
+    """
+    Raised in replay mode when a request was never recorded
+    """
+
+
+class CassetteResponse:
+    """
+    A recorded response with the parts of requests.Response the scraper uses
+    """
+
+    def __init__(self, status_code, content, headers=None, url=""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for {self.url}")
+
+
+class GeminiReply:
+    """
+    A recorded Gemini answer - only `.text` is used by the app
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+
+def get_mode():
+    mode = os.environ.get("REVIEW_HTTP_MODE", "live").strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"REVIEW_HTTP_MODE must be one of {', '.join(MODES)} (got '{mode}')")
+    return mode
+
+
+def get_cassette_dir():
+    return os.environ.get("REVIEW_CASSETTE_DIR", "cassettes")
+
+
+def _cassette_path(kind, key_parts):
+    """
+    Cassette file for a request - the name is a hash of everything that makes it unique
+    """
+    key = json.dumps(key_parts, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(get_cassette_dir(), kind, f"{digest}.json.gz")
+
+
+def _read_cassette(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_cassette(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def http_get(url, headers=None, params=None, timeout=15):
+    """
+    Drop-in for requests.get that records or replays depending on the mode
+    Headers are not part of the key, so changing the User-Agent keeps old cassettes valid
+    """
+    mode = get_mode()
+    path = _cassette_path("http", {"method": "GET", "url": url, "params": params or {}})
+
+    if mode == "replay":
+        if not os.path.exists(path):
+            raise CassetteMissError(f"No recorded response for GET {url}")
+        data = _read_cassette(path)
+        return CassetteResponse(data["status_code"], data["content"].encode('latin-1'), data["headers"], url)
+
+    response = requests.get(url, headers=headers, params=params, timeout=timeout)
+
+    if mode == "record":
+        _write_cassette(path, {
+            "url": url,
+            "params": params or {},
+            "status_code": response.status_code,
+            # latin-1 maps every byte to one character, so binary bodies survive the JSON round trip
+            "content": response.content.decode('latin-1'),
+            "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+            "recorded_at": datetime.now().isoformat(timespec="seconds")
+        })
+
+    return response
+
+
+def generate_content(model, prompt):
+    """
+    Drop-in for model.generate_content(prompt) with the same record/replay behaviour
+    """
+    mode = get_mode()
+    model_name = getattr(model, "model_name", str(model))
+    path = _cassette_path("gemini", {"model": model_name, "prompt": prompt})
+
+    if mode == "replay":
+        if not os.path.exists(path):
+            raise CassetteMissError(f"No recorded Gemini answer for this prompt ({model_name})")
+        return GeminiReply(_read_cassette(path)["text"])
+
+    response = model.generate_content(prompt)
+
+    if mode == "record":
+        _write_cassette(path, {
+            "model": model_name,
+            "prompt": prompt,
+            "text": response.text,
+            "recorded_at": datetime.now().isoformat(timespec="seconds")
+        })
+
+    return response
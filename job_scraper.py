@@ -3,6 +3,31 @@ import requests
 from bs4 import BeautifulSoup
 import sys
 import time
+from html_extract import ExtractionSchema, Field
+
+# Different selectors that BambooHR might use, most specific first
+JOB_SCHEMA = ExtractionSchema(
+    containers=[
+        '.jss-g13',             # The specific class for job links (most specific)
+        'a[href*="/careers/"]', # BambooHR uses /careers/ not /jobs/
+        '.fabric-5qovnk-root',  # The container div class
+        '#js-careers-root main section ul li div',  # The specific path you found
+        'main section ul li div',                   # Simplified version
+        'ul li div',                               # Even more simplified
+        'a[href*="/jobs/"]',
+        '.job-title',
+        '.position-title', 
+        '[data-testid*="job"]',
+        'h3 a',
+        'h4 a',
+        '.job-listing a'
+    ],
+    fields={
+        # The container can be the link itself (like .jss-g13) or hold the link inside
+        'title': Field('a[href]', include_self=True, strip=False, process=str.strip),
+        'link': Field('a[href]', attr='href', include_self=True, default='')
+    }
+)
 
 def scrape_bamboohr_jobs():
     """Scrape jobs from BambooHR careers page."""
@@ -24,28 +49,11 @@ def scrape_bamboohr_jobs():
         # Look for job listings - common selectors for job boards
         jobs = []
         
-        # Try different selectors that BambooHR might use
-        job_selectors = [
-            '.jss-g13',             # The specific class for job links (most specific)
-            'a[href*="/careers/"]', # BambooHR uses /careers/ not /jobs/
-            '.fabric-5qovnk-root',  # The container div class
-            '#js-careers-root main section ul li div',  # The specific path you found
-            'main section ul li div',                   # Simplified version
-            'ul li div',                               # Even more simplified
-            'a[href*="/jobs/"]',
-            '.job-title',
-            '.position-title', 
-            '[data-testid*="job"]',
-            'h3 a',
-            'h4 a',
-            '.job-listing a'
-        ]
-        
-        for selector in job_selectors:
-            elements = soup.select(selector)
-            if elements:
-                print(f"Found {len(elements)} jobs using selector: {selector}")
-                break
+        # Try all the job selectors in one pass over the page
+        match = JOB_SCHEMA.find_containers(soup)
+        elements = match.containers
+        if match:
+            print(f"Found {len(elements)} jobs using selector: {match.selector}")
         
         if not elements:
             # Fallback: look for any links that might be jobs
@@ -57,17 +65,9 @@ def scrape_bamboohr_jobs():
         # Extract job info
         for i, element in enumerate(elements[:15]):  # Get more than 10 to filter
             try:
-                # If element is already a link (like .jss-g13), use it directly
-                if element.name == 'a' and element.get('href'):
-                    job_link = element
-                else:
-                    # Look for the job link within this element
-                    job_link = element.find('a', href=True)
-                    if not job_link:
-                        continue
-                        
-                title = job_link.get_text().strip()
-                link = job_link.get('href', '')
+                job = JOB_SCHEMA.extract_fields(element)
+                title = job['title']
+                link = job['link']
                 
                 # Make sure it's a job link
                 if not title or len(title) < 3:
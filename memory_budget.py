@@ -0,0 +1,132 @@
+"""
+In-memory caches with a size limit in bytes
+Least recently used entries are dropped once a cache goes over its budget, so many
+dashboard sessions can't grow the server's memory without limit
+
+Budgets (in MB) can be set with REVIEW_SESSION_CACHE_MB and REVIEW_GLOBAL_CACHE_MB
+"""
+
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+SESSION_BUDGET_BYTES = int(float(os.environ.get("REVIEW_SESSION_CACHE_MB", "32")) * 1024 * 1024)
+GLOBAL_BUDGET_BYTES = int(float(os.environ.get("REVIEW_GLOBAL_CACHE_MB", "256")) * 1024 * 1024)
+
+# Every cache that is still alive, for the admin view (ended sessions drop out by themselves)
+_all_caches = weakref.WeakSet()
+
+_MISSING = object()
+
+
+def estimate_size(value):
+    """
+    Approximate memory used by a value and everything inside it, in bytes
+    Objects shared between several places are only counted once
+    """
+    seen = set()
+    total = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return total
+
+
+class ByteBudgetLRU:
+    """
+    Dict-like LRU cache limited to `max_bytes` in total
+    A value bigger than the whole budget is not cached at all
+    """
+
+    def __init__(self, name, max_bytes, scope="global"):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.scope = scope
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _all_caches.add(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "scope": self.scope,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+def session_cache(session_state, name="analysis results", max_bytes=SESSION_BUDGET_BYTES):
+    """
+    The size-limited cache of one Streamlit session (kept in its session_state)
+    """
+    key = f"_budget_cache_{name}"
+    if key not in session_state:
+        session_state[key] = ByteBudgetLRU(name, max_bytes, scope="session")
+    return session_state[key]
+
+
+def all_cache_stats():
+    """
+    Stats of every live cache, global ones first
+    """
+    return sorted((cache.stats() for cache in list(_all_caches)), key=lambda s: (s["scope"] != "global", s["name"]))
@@ -0,0 +1,140 @@
+"""
+Archive of every page the scraper downloads
+Pages are stored zstd-compressed under the SHA-256 of their content, so a page that didn't
+change between downloads is only stored once. A small SQLite index remembers which URL was
+fetched when, so old pages can be parsed again when the Play Store markup changes
+(see backfill_reviews.py).
+
+Set REVIEW_ARCHIVE_DIR to choose the folder (default: page_archive)
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+DEFAULT_ARCHIVE_DIR = os.environ.get("REVIEW_ARCHIVE_DIR", "page_archive")
+COMPRESSION_LEVEL = 10
+
+
+class PageArchive:
+    """
+    Content-addressed page store: objects/ab/abcdef....zst plus index.db
+    """
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fetches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    page_hash TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_fetches_hash ON fetches (page_hash);
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _object_path(self, page_hash, suffix):
+        return os.path.join(self.root, "objects", page_hash[:2], page_hash + suffix)
+
+    def put(self, content, url):
+        """
+        Archive one downloaded page and return its hash
+        The page itself is only written the first time this exact content is seen
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        page_hash = hashlib.sha256(content).hexdigest()
+
+        if self._find_object(page_hash) is None:
+            if ZSTD_AVAILABLE:
+                data, suffix = zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(content), ".zst"
+            else:
+                data, suffix = gzip.compress(content), ".gz"
+            path = self._object_path(page_hash, suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first, so a crash never leaves half a page behind
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+
+        with self._connect() as conn:
+            conn.execute("INSERT INTO fetches (url, page_hash, fetched_at) VALUES (?, ?, ?)",
+                         (url, page_hash, datetime.now().isoformat(timespec="seconds")))
+        return page_hash
+
+    def _find_object(self, page_hash):
+        for suffix in (".zst", ".gz"):
+            path = self._object_path(page_hash, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, page_hash):
+        """
+        The original page content for a hash
+        """
+        path = self._find_object(page_hash)
+        if path is None:
+            raise KeyError(page_hash)
+        with open(path, "rb") as file:
+            data = file.read()
+        if path.endswith(".gz"):
+            return gzip.decompress(data)
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("zstandard is needed to read this archive (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    def fetches(self, url_prefix=""):
+        """
+        Every archived download (oldest first) as {"url", "page_hash", "fetched_at"}
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT url, page_hash, fetched_at FROM fetches WHERE url LIKE ? ORDER BY id", (url_prefix + "%",)
+            ).fetchall()
+        return [{"url": url, "page_hash": page_hash, "fetched_at": fetched_at} for url, page_hash, fetched_at in rows]
+
+    def stats(self):
+        """
+        Number of downloads, distinct pages and bytes on disk
+        """
+        with self._connect() as conn:
+            downloads, pages = conn.execute("SELECT COUNT(*), COUNT(DISTINCT page_hash) FROM fetches").fetchone()
+        stored_bytes = 0
+        for folder, _, files in os.walk(os.path.join(self.root, "objects")):
+            stored_bytes += sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+        return {"downloads": downloads, "pages": pages, "stored_bytes": stored_bytes}
+
+
+def play_store_target(url):
+    """
+    (app id, locale) from a Play Store details URL, or (None, None) for other URLs
+    """
+    query = parse_qs(urlparse(url).query)
+    if "play.google.com" not in url or "id" not in query:
+        return None, None
+    return query["id"][0], query.get("hl", ["pt_PT"])[0]
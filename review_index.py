@@ -0,0 +1,141 @@
+"""
+Date helpers for the Via Verde review scraper
+Turns the Play Store date strings into real dates and keeps reviews sorted by time
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+
+from review_text import fold_accents
+
+# Month names as they appear on the Play Store (pt_PT and en pages)
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+    'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12,
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'feb': 2, 'apr': 4, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'dec': 12
+}
+
+# "12 de março de 2025" / "12 March 2025"
+DAY_MONTH_YEAR = re.compile(r'^(\d{1,2})\s+(?:de\s+)?([a-z]+)\.?,?\s+(?:de\s+)?(\d{4})$')
+# "March 12, 2025"
+MONTH_DAY_YEAR = re.compile(r'^([a-z]+)\.?\s+(\d{1,2}),?\s+(\d{4})$')
+# "12/03/2025" (pt_PT puts the day first)
+NUMERIC_DATE = re.compile(r'^(\d{1,2})/(\d{1,2})/(\d{4})$')
+# "2025-03-12" (dates we already normalized)
+ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+
+
+@lru_cache(maxsize=4096)
+def parse_review_date(date_text):
+    """
+    Convert a Play Store date string into a date
+    Returns None for text we can't read, like the "Recent" fallback
+    Results are cached because the same few hundred dates repeat across reviews
+    """
+    if not date_text:
+        return None
+
+    # Lowercase without accents, so "Março" and "marco" look the same
+    text = fold_accents(date_text.strip().lower())
+
+    try:
+        match = ISO_DATE.match(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        match = DAY_MONTH_YEAR.match(text)
+        if match and match.group(2) in MONTHS:
+            return date(int(match.group(3)), MONTHS[match.group(2)], int(match.group(1)))
+
+        match = MONTH_DAY_YEAR.match(text)
+        if match and match.group(1) in MONTHS:
+            return date(int(match.group(3)), MONTHS[match.group(1)], int(match.group(2)))
+
+        match = NUMERIC_DATE.match(text)
+        if match:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+    except ValueError:
+        # Things like "31 de fevereiro" - not a real date
+        return None
+
+    return None
+
+
+def review_date(review):
+    """
+    Get the date of a review, using the normalized "date_iso" field when it exists
+    """
+    return parse_review_date(review.get('date_iso') or review.get('date', ''))
+
+
+class ReviewTimeIndex:
+    """
+    Keeps reviews sorted by date so time windows can be found with a binary search
+    Reviews without a readable date are kept apart in `undated`
+    """
+
+    def __init__(self, reviews=None):
+        self._days = []       # date ordinals, always sorted
+        self._reviews = []    # reviews in the same order as _days
+        self._counter = 0     # tie-breaker so equal dates keep insertion order
+        self.undated = []
+
+        # Sort the starting reviews once (a stable sort keeps the order of equal dates),
+        # instead of inserting them one at a time
+        dated = []
+        for review in reviews or []:
+            review_day = review_date(review)
+            if review_day is None:
+                self.undated.append(review)
+            else:
+                dated.append((review_day.toordinal(), review))
+        dated.sort(key=lambda item: item[0])
+        for ordinal, review in dated:
+            self._days.append((ordinal, self._counter))
+            self._reviews.append(review)
+            self._counter += 1
+
+    def __len__(self):
+        return len(self._reviews)
+
+    def add(self, review):
+        """
+        Add one review in its sorted place
+        """
+        review_day = review_date(review)
+        if review_day is None:
+            self.undated.append(review)
+            return
+
+        key = (review_day.toordinal(), self._counter)
+        self._counter += 1
+        position = bisect_right(self._days, key)
+        self._days.insert(position, key)
+        self._reviews.insert(position, review)
+
+    def between(self, start=None, end=None):
+        """
+        Reviews dated from `start` to `end` (both included), oldest first
+        """
+        low = 0 if start is None else bisect_left(self._days, (start.toordinal(), -1))
+        high = len(self._days) if end is None else bisect_right(self._days, (end.toordinal(), float('inf')))
+        return self._reviews[low:high]
+
+    def last_days(self, days, today=None):
+        """
+        Reviews from the last `days` days, counting today
+        """
+        today = today or date.today()
+        return self.between(today - timedelta(days=days - 1), today)
+
+    def first_date(self):
+        return date.fromordinal(self._days[0][0]) if self._days else None
+
+    def last_date(self):
+        return date.fromordinal(self._days[-1][0]) if self._days else None
@@ -0,0 +1,85 @@
+"""
+Choosing which reviews go into a Gemini prompt
+Picks a sample that follows the rating distribution, skips duplicate texts and fits a
+token budget, so the size (and cost) of the prompt doesn't grow with the number of reviews
+"""
+
+import math
+import os
+
+from review_text import text_forms
+
+# Rough size of a token for Gemini on Portuguese/English text
+CHARS_PER_TOKEN = 4
+
+# How many tokens of reviews the overall analysis may send (override with GEMINI_PROMPT_TOKEN_BUDGET)
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("GEMINI_PROMPT_TOKEN_BUDGET", "2000"))
+
+# Very long reviews are cut to this many characters so one review can't fill the budget
+MAX_REVIEW_CHARS = 600
+
+# Smallest possible review line ("⭐ 5/5 - " plus a short text) - below this the budget is used up
+MIN_LINE_TOKENS = 6
+
+
+def estimate_tokens(text):
+    """
+    Predict how many tokens a text will use, without calling the API
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def review_prompt_line(review, max_chars=MAX_REVIEW_CHARS):
+    """
+    One review as it appears in a prompt: "⭐ 4/5 - text"
+    """
+    text = text_forms(review)["nfc"]
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + "..."
+    return f"⭐ {review.get('rating', 0)}/5 - {text}"
+
+
+def sample_reviews(reviews, token_budget=DEFAULT_TOKEN_BUDGET, max_chars=MAX_REVIEW_CHARS):
+    """
+    Prompt lines for a sample of reviews that fits in `token_budget` tokens
+
+    - every rating that appears gets at least one review, then ratings are filled
+      in proportion to how many reviews they have
+    - reviews with the same text (ignoring case and accents) are only used once
+    - within a rating, the most useful reviews come first
+    """
+    strata = {}
+    seen_texts = set()
+    for review in reviews:
+        forms = text_forms(review)
+        if not forms["has_text"]:
+            continue
+        dedupe_key = " ".join(forms["folded"].split())
+        if dedupe_key in seen_texts:
+            continue
+        seen_texts.add(dedupe_key)
+        strata.setdefault(review.get('rating', 0), []).append(review)
+
+    sizes = {rating: len(candidates) for rating, candidates in strata.items()}
+    for candidates in strata.values():
+        candidates.sort(key=lambda r: (r.get('useful_count', 0), len(r.get('review', ''))))  # best last, for pop()
+
+    taken = {rating: 0 for rating in strata}
+    lines = []
+    tokens_left = token_budget
+    while strata:
+        # The rating that is furthest behind its share of the sample goes next
+        rating = min(strata, key=lambda r: (taken[r] > 0, (taken[r] + 1) / sizes[r], -r))
+        line = review_prompt_line(strata[rating].pop(), max_chars)
+        cost = estimate_tokens(line) + 1  # +1 for the line break
+        if cost <= tokens_left:
+            lines.append((rating, line))
+            taken[rating] += 1
+            tokens_left -= cost
+        if not strata[rating]:
+            del strata[rating]
+        if tokens_left < MIN_LINE_TOKENS:
+            break
+
+    # Best ratings first, like the rest of the dashboard
+    return [line for rating, line in sorted(lines, key=lambda item: -item[0])]
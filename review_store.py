@@ -0,0 +1,484 @@
+"""
+Local SQLite store for the Via Verde review scraper
+Keeps every review we have seen, the analysis results for each review,
+and running totals for the whole history, so each run only has to analyze new reviews
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_STORE_PATH = os.environ.get("REVIEW_STORE_PATH", "reviews.db")
+
+
+def review_hash(review):
+    """
+    Stable id for a review, built from who wrote it, where, when and what
+    """
+    if review.get("review_hash"):
+        return review["review_hash"]
+    key = "|".join(str(review.get(field, "")) for field in ("os", "app_id", "reviewer_name", "date", "review"))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class ReviewStore:
+    """
+    Reviews, per-review analysis results and corpus totals in one SQLite file
+    A new connection is opened for each call, so the store can be shared between threads
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    review_hash TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    date_iso TEXT,
+                    rating INTEGER,
+                    ingested_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews (date_iso);
+                CREATE TABLE IF NOT EXISTS analyses (
+                    kind TEXT NOT NULL,
+                    review_hash TEXT NOT NULL,
+                    result TEXT,
+                    PRIMARY KEY (kind, review_hash)
+                );
+                CREATE TABLE IF NOT EXISTS aggregates (
+                    name TEXT PRIMARY KEY,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS corpus_counters (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value NUMERIC NOT NULL,
+                    PRIMARY KEY (name, key)
+                );
+                CREATE TABLE IF NOT EXISTS term_stats (
+                    name TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    tf REAL NOT NULL,
+                    df INTEGER NOT NULL,
+                    PRIMARY KEY (name, term)
+                );
+                CREATE TABLE IF NOT EXISTS term_forms (
+                    name TEXT NOT NULL,
+                    stem TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (name, stem, word)
+                );
+                CREATE TABLE IF NOT EXISTS daily_rollups (
+                    day TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    reviews INTEGER NOT NULL,
+                    rating_sum INTEGER NOT NULL,
+                    one_star INTEGER NOT NULL,
+                    sentiment_count INTEGER NOT NULL,
+                    polarity_sum REAL NOT NULL,
+                    PRIMARY KEY (day, source)
+                );
+                CREATE TABLE IF NOT EXISTS daily_keywords (
+                    day TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    mentions INTEGER NOT NULL,
+                    PRIMARY KEY (day, source, keyword)
+                );
+            """)
+
+        self._migrate_json_totals()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.create_function("ln", 1, math.log)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        One write transaction that takes the write lock before its first read (BEGIN IMMEDIATE),
+        so two writers never both act on what they read before the other one wrote
+        """
+        with self._connect() as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _migrate_json_totals(self):
+        """
+        Move history totals saved by older versions as JSON into corpus_counters (once)
+        """
+        with self._transaction() as conn:
+            rows = dict(conn.execute(
+                "SELECT name, data FROM aggregates WHERE name IN ('corpus_sentiment', 'corpus_patterns')"
+            ).fetchall())
+            if not rows:
+                return
+            counters = {}
+            sentiment = json.loads(rows.get("corpus_sentiment", "{}"))
+            for key in ("count", "polarity_sum", "subjectivity_sum"):
+                if key in sentiment:
+                    counters[("sentiment", key)] = sentiment[key]
+            for tone, count in sentiment.get("tones", {}).items():
+                counters[("tones", tone)] = count
+            for category, counts in json.loads(rows.get("corpus_patterns", "{}")).items():
+                for key, count in counts.items():
+                    counters[(category, key)] = count
+            _increment_counters(conn, counters)
+            conn.execute("DELETE FROM aggregates WHERE name IN ('corpus_sentiment', 'corpus_patterns')")
+
+    # --- Reviews ---
+
+    def add_reviews(self, reviews, totals_for=None):
+        """
+        Save reviews we haven't seen before and return only those new ones
+        Every review gets a "review_hash" field
+
+        totals_for(new_reviews) can return what the new reviews add to the history totals
+        ({"counters": {(name, key): amount}, "terms": {name: ({term: (tf, df)}, documents, {(stem, word): count})},
+        "daily": (rollups, keyword_mentions)} - see _add_term_counts and _add_daily_rollups);
+        it is added in the same transaction that inserts the reviews, so however many
+        sessions store the same reviews at once, each review is counted exactly once
+        """
+        for review in reviews:
+            review["review_hash"] = review_hash(review)
+
+        now = datetime.now().isoformat(timespec="seconds")
+        new_reviews = []
+        with self._transaction() as conn:
+            for r in reviews:
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO reviews (review_hash, data, date_iso, rating, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                    (r["review_hash"], _review_json(r), r.get("date_iso"), r.get("rating", 0), now)
+                ).rowcount
+                if inserted:
+                    new_reviews.append(r)
+
+            if new_reviews and totals_for is not None:
+                totals = totals_for(new_reviews)
+                _increment_counters(conn, totals.get("counters", {}))
+                for name, term_totals in totals.get("terms", {}).items():
+                    _add_term_counts(conn, name, *term_totals)
+                if totals.get("daily"):
+                    _add_daily_rollups(conn, *totals["daily"])
+        return new_reviews
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def all_reviews(self):
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute("SELECT data FROM reviews ORDER BY date_iso")]
+
+    def iter_reviews(self, chunk_size=1000):
+        """
+        All stored reviews, as lists of at most `chunk_size` reviews
+        Only one chunk is in memory at a time, however big the store gets
+        """
+        last_rowid = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT rowid, data FROM reviews WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [json.loads(data) for _, data in rows]
+
+    # --- Per-review analysis results ---
+
+    def get_results(self, kind, hashes):
+        """
+        Saved results of one analysis kind, as {review_hash: result}
+        Reviews that were never analyzed are left out
+        """
+        with self._connect() as conn:
+            return _saved_results(conn, kind, hashes)
+
+    def save_results(self, kind, results):
+        """
+        Save {review_hash: result}. A result of None is stored too, so we don't retry it
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analyses (kind, review_hash, result) VALUES (?, ?, ?)",
+                [(kind, hash_value, json.dumps(result, ensure_ascii=False) if result is not None else None)
+                 for hash_value, result in results.items()]
+            )
+
+    # --- Corpus totals ---
+
+    def counters(self, name):
+        """
+        History totals of one kind as {key: value} (e.g. "tones" -> {"Positive": 120, ...})
+        """
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT key, value FROM corpus_counters WHERE name = ?", (name,)).fetchall())
+
+    def get_aggregate(self, name, default=None):
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM aggregates WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def save_aggregate(self, name, value):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO aggregates (name, data) VALUES (?, ?)",
+                         (name, json.dumps(value, ensure_ascii=False)))
+
+    def top_terms(self, name, top_n=20):
+        """
+        Highest scoring terms, scored as total tf times smoothed idf (like scikit-learn's default)
+        Stemmed words are shown as the form people wrote most often (see term_forms)
+        """
+        documents = self.get_aggregate(f"{name}_documents", 0)
+        if not documents:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT term, tf * (ln((1.0 + ?) / (1.0 + df)) + 1.0) AS score
+                   FROM term_stats WHERE name = ? ORDER BY score DESC LIMIT ?""",
+                (documents, name, top_n)
+            ).fetchall()
+            stems = list({word for term, _ in rows for word in term.split(" ")})
+            forms = {}
+            for batch in _batches(stems):
+                # Ascending count, so the most common form of each stem is kept last
+                for word_stem, word in conn.execute(
+                    f"""SELECT stem, word FROM term_forms WHERE name = ? AND stem IN ({_placeholders(batch)})
+                        ORDER BY count""", [name] + batch
+                ):
+                    forms[word_stem] = word
+        return {" ".join(forms.get(word, word) for word in term.split(" ")): score for term, score in rows}
+
+    def rebuild_term_stats(self, name, terms_for, version, chunk_size=2000):
+        """
+        Recompute the term statistics called `name` from every stored review, once per `version`
+        (e.g. after the way terms are extracted changed, so old and new counts don't mix)
+        terms_for(reviews, results) returns ({term: (tf, df)}, documents, {(stem, word): count})
+        """
+        def reset(conn):
+            conn.execute("DELETE FROM term_stats WHERE name = ?", (name,))
+            conn.execute("DELETE FROM term_forms WHERE name = ?", (name,))
+            conn.execute("DELETE FROM aggregates WHERE name = ?", (f"{name}_documents",))
+
+        def add(conn, reviews, results):
+            _add_term_counts(conn, name, *terms_for(reviews, results))
+
+        return self._rebuild_once(f"{name}_terms_version", version, reset, add, chunk_size)
+
+    def _rebuild_once(self, marker, version, reset, add, chunk_size):
+        """
+        Reset some totals and add every stored review (with its saved results) to them again,
+        in one transaction, unless the `marker` aggregate says this version was already done
+        """
+        with self._transaction() as conn:
+            done = conn.execute("SELECT data FROM aggregates WHERE name = ?", (marker,)).fetchone()
+            if done and json.loads(done[0]) >= version:
+                return False
+            reset(conn)
+            last_rowid = 0
+            while True:
+                rows = conn.execute(
+                    "SELECT rowid, data FROM reviews WHERE rowid > ? ORDER BY rowid LIMIT ?", (last_rowid, chunk_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                reviews = [json.loads(data) for _, data in rows]
+                hashes = [review["review_hash"] for review in reviews]
+                results = {kind: _saved_results(conn, kind, hashes) for kind in ("sentiment", "patterns")}
+                add(conn, reviews, results)
+            conn.execute("INSERT OR REPLACE INTO aggregates (name, data) VALUES (?, ?)", (marker, json.dumps(version)))
+        return True
+
+    # --- Snapshots (what the dashboard shows while a refresh runs) ---
+
+    def save_snapshot(self, key, android_reviews, ios_reviews):
+        """
+        Save the latest collected reviews so the next visit can show them right away
+        """
+        snapshot = {
+            "taken_at": datetime.now().isoformat(timespec="seconds"),
+            "android": [_review_dict(r) for r in android_reviews],
+            "ios": [_review_dict(r) for r in ios_reviews]
+        }
+        self.save_aggregate(f"snapshot:{key}", snapshot)
+        return snapshot
+
+    def load_snapshot(self, key):
+        return self.get_aggregate(f"snapshot:{key}")
+
+    def snapshot_time(self, key):
+        """
+        When the snapshot was taken, without loading all its reviews
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT json_extract(data, '$.taken_at') FROM aggregates WHERE name = ?",
+                               (f"snapshot:{key}",)).fetchone()
+        return row[0] if row else None
+
+    # --- Daily rollups (for trend charts) ---
+
+    def rebuild_daily_rollups(self, daily_for, version, chunk_size=2000):
+        """
+        Recompute the per-day totals from every stored review and its saved results, once per `version`
+        (totals written by older versions could count a review more than once)
+        daily_for(reviews, {"sentiment": {...}, "patterns": {...}}) returns (rollups, keyword_mentions)
+        """
+        def reset(conn):
+            conn.execute("DELETE FROM daily_rollups")
+            conn.execute("DELETE FROM daily_keywords")
+
+        def add(conn, reviews, results):
+            _add_daily_rollups(conn, *daily_for(reviews, results))
+
+        return self._rebuild_once("daily_rollups_version", version, reset, add, chunk_size)
+
+    def daily_rollups(self, sources=None, since=None):
+        """
+        One row per day (oldest first) with the totals of the chosen sources added up
+        """
+        query = """SELECT day, SUM(reviews), SUM(rating_sum), SUM(one_star), SUM(sentiment_count), SUM(polarity_sum)
+                   FROM daily_rollups WHERE day >= ?"""
+        params = [since or ""]
+        if sources:
+            query += f" AND source IN ({_placeholders(sources)})"
+            params += list(sources)
+        query += " GROUP BY day ORDER BY day"
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {"day": day, "reviews": reviews, "rating_sum": rating_sum, "one_star": one_star,
+             "sentiment_count": sentiment_count, "polarity_sum": polarity_sum}
+            for day, reviews, rating_sum, one_star, sentiment_count, polarity_sum in rows
+        ]
+
+    def daily_keyword_mentions(self, keywords, sources=None, since=None):
+        """
+        {day: {keyword: mentions}} for the given keywords
+        """
+        query = f"""SELECT day, keyword, SUM(mentions) FROM daily_keywords
+                    WHERE day >= ? AND keyword IN ({_placeholders(keywords)})"""
+        params = [since or ""] + list(keywords)
+        if sources:
+            query += f" AND source IN ({_placeholders(sources)})"
+            params += list(sources)
+        query += " GROUP BY day, keyword ORDER BY day"
+
+        mentions = {}
+        with self._connect() as conn:
+            for day, keyword, count in conn.execute(query, params):
+                mentions.setdefault(day, {})[keyword] = count
+        return mentions
+
+
+
+def _saved_results(conn, kind, hashes):
+    results = {}
+    hashes = list(set(hashes))
+    for batch in _batches(hashes):
+        rows = conn.execute(
+            f"SELECT review_hash, result FROM analyses WHERE kind = ? AND review_hash IN ({_placeholders(batch)})",
+            [kind] + batch
+        )
+        for hash_value, result in rows:
+            results[hash_value] = json.loads(result) if result is not None else None
+    return results
+
+
+def _increment_counters(conn, counters):
+    """
+    Add {(name, key): amount} to corpus_counters in SQL, inside the caller's transaction
+    """
+    conn.executemany(
+        """INSERT INTO corpus_counters (name, key, value) VALUES (?, ?, ?)
+           ON CONFLICT (name, key) DO UPDATE SET value = value + excluded.value""",
+        [(name, key, amount) for (name, key), amount in counters.items()]
+    )
+
+
+def _add_term_counts(conn, name, term_counts, documents, word_forms=None):
+    """
+    Add term frequencies and document frequencies from new reviews
+    term_counts is {term: (tf, df)} and documents is how many reviews they came from;
+    word_forms is {(stem, word): count}, how often each stemmed word was written each way
+    """
+    conn.executemany(
+        """INSERT INTO term_forms (name, stem, word, count) VALUES (?, ?, ?, ?)
+           ON CONFLICT (name, stem, word) DO UPDATE SET count = count + excluded.count""",
+        [(name, word_stem, word, count) for (word_stem, word), count in (word_forms or {}).items()]
+    )
+    conn.executemany(
+        """INSERT INTO term_stats (name, term, tf, df) VALUES (?, ?, ?, ?)
+           ON CONFLICT (name, term) DO UPDATE SET tf = tf + excluded.tf, df = df + excluded.df""",
+        [(name, term, tf, df) for term, (tf, df) in term_counts.items()]
+    )
+    conn.execute(
+        """INSERT INTO aggregates (name, data) VALUES (?, ?)
+           ON CONFLICT (name) DO UPDATE SET data = CAST(data AS INTEGER) + excluded.data""",
+        (f"{name}_documents", documents)
+    )
+
+
+def _add_daily_rollups(conn, rollups, keyword_mentions):
+    """
+    Add new reviews to the per-day totals
+    rollups: {(day, source): {"reviews", "rating_sum", "one_star", "sentiment_count", "polarity_sum"}}
+    keyword_mentions: {(day, source, keyword): mentions}
+    """
+    conn.executemany(
+        """INSERT INTO daily_rollups (day, source, reviews, rating_sum, one_star, sentiment_count, polarity_sum)
+           VALUES (?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (day, source) DO UPDATE SET
+               reviews = reviews + excluded.reviews,
+               rating_sum = rating_sum + excluded.rating_sum,
+               one_star = one_star + excluded.one_star,
+               sentiment_count = sentiment_count + excluded.sentiment_count,
+               polarity_sum = polarity_sum + excluded.polarity_sum""",
+        [(day, source, r["reviews"], r["rating_sum"], r["one_star"], r["sentiment_count"], r["polarity_sum"])
+         for (day, source), r in rollups.items()]
+    )
+    conn.executemany(
+        """INSERT INTO daily_keywords (day, source, keyword, mentions) VALUES (?, ?, ?, ?)
+           ON CONFLICT (day, source, keyword) DO UPDATE SET mentions = mentions + excluded.mentions""",
+        [(day, source, keyword, mentions) for (day, source, keyword), mentions in keyword_mentions.items()]
+    )
+
+
+def _review_dict(review):
+    # Normalized text forms are cheap to rebuild, so they are not written to disk
+    return {key: value for key, value in review.items() if key != "text_forms"}
+
+
+def _review_json(review):
+    return json.dumps(_review_dict(review), ensure_ascii=False)
+
+
+def _placeholders(values):
+    return ", ".join("?" for _ in values)
+
+
+def _batches(values, size=500):
+    # SQLite limits how many ? placeholders one query can have
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
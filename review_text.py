@@ -0,0 +1,115 @@
+"""
+Text clean-up shared by every review analysis
+Each review's text is normalized once (NFC, lowercase, without accents, split into words)
+and the result is kept on the review, so the analyses don't each redo it
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+NO_TEXT = "Review text not available"
+
+# Same word pattern scikit-learn's TfidfVectorizer uses: words of 2+ letters/digits
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Negations change what a review means ("não funciona"), so they are kept as keywords
+KEEP_WORDS = {"não", "nem", "sem", "nunca"}
+
+# Used when NLTK's stopword list isn't installed (see load_nltk_resource)
+FALLBACK_STOPWORDS = {
+    "de", "a", "o", "que", "e", "do", "da", "em", "um", "para", "é", "com", "uma", "os", "no", "se", "na",
+    "por", "mais", "as", "dos", "como", "mas", "foi", "ao", "ele", "das", "tem", "à", "seu", "sua", "ou",
+    "ser", "quando", "muito", "há", "nos", "já", "está", "eu", "também", "só", "pelo", "pela", "até", "isso",
+    "ela", "entre", "era", "depois", "mesmo", "aos", "ter", "seus", "quem", "nas", "me", "esse", "eles",
+    "estão", "você", "tinha", "foram", "essa", "num", "suas", "meu", "às", "minha", "têm", "numa", "pelos",
+    "elas", "havia", "seja", "qual", "será", "nós", "tenho", "lhe", "deles", "essas", "esses", "pelas",
+    "este", "fosse", "dele", "tu", "te", "vocês", "vos", "lhes", "meus", "minhas", "teu", "tua", "nosso",
+    "nossa", "nossos", "nossas", "dela", "delas", "esta", "estes", "estas", "aquele", "aquela", "aqueles",
+    "aquelas", "isto", "aquilo", "estou", "estamos", "estava", "fui", "sou", "somos", "são", "vai", "ir"
+}
+
+
+def fold_accents(text):
+    """
+    Remove accents: "não é fácil" -> "nao e facil"
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_text(text):
+    """
+    All the forms of a review text the analyses need
+    - nfc: original text with consistent unicode (for TextBlob and Gemini)
+    - lower: lowercase (for keyword checks)
+    - folded: lowercase without accents (so "nao" matches "não")
+    - tokens: lowercase words (for TF-IDF)
+    - has_text: False for empty text or the "Review text not available" placeholder
+    """
+    nfc = unicodedata.normalize('NFC', (text or '').strip())
+    lower = nfc.lower()
+    return {
+        "nfc": nfc,
+        "lower": lower,
+        "folded": fold_accents(lower),
+        "tokens": TOKEN_PATTERN.findall(lower),
+        "has_text": bool(nfc) and nfc != NO_TEXT
+    }
+
+
+def text_forms(review):
+    """
+    Normalized forms for a review, computed the first time and kept in review["text_forms"]
+    """
+    forms = review.get("text_forms")
+    if forms is None:
+        forms = normalize_text(review.get('review', ''))
+        review["text_forms"] = forms
+    return forms
+
+
+def load_nltk_resource(load):
+    """
+    Load an NLTK resource - None when NLTK or its data isn't installed
+    The data is never downloaded while the app runs; install it once with
+        python -m nltk.downloader stopwords rslp
+    (setup.sh and setup.bat do this)
+    """
+    try:
+        return load()
+    except (ImportError, LookupError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def portuguese_stopwords():
+    """
+    NLTK's Portuguese stopwords (or a built-in list), without the negations in KEEP_WORDS
+    """
+    def load():
+        from nltk.corpus import stopwords
+        return stopwords.words("portuguese")
+
+    words = load_nltk_resource(load) or FALLBACK_STOPWORDS
+    return frozenset(word.lower() for word in words) - KEEP_WORDS
+
+
+@lru_cache(maxsize=None)
+def _rslp_stemmer():
+    def load():
+        from nltk.stem import RSLPStemmer
+        return RSLPStemmer()
+
+    return load_nltk_resource(load)
+
+
+@lru_cache(maxsize=20_000)
+def stem(word):
+    """
+    Portuguese stem of a word with NLTK's RSLP stemmer ("funcionando" -> "funcion")
+    Each word is stemmed once and remembered; without the stemmer data (see load_nltk_resource),
+    words are kept as they are
+    """
+    stemmer = _rslp_stemmer()
+    return stemmer.stem(word) if stemmer else word
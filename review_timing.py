@@ -0,0 +1,165 @@
+"""
+Lightweight timing for the review dashboard
+Measures how long each stage takes (fetch, parse, analyses, rendering)
+and how often caches are hit, so slow page loads can be explained
+"""
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+# The run being measured and the span we are currently inside.
+# Context variables keep Streamlit sessions apart and can be copied into worker threads.
+_current_run = contextvars.ContextVar("review_timing_run", default=None)
+_current_span = contextvars.ContextVar("review_timing_span", default=None)
+
+# Caches that can report their own hits/misses (like functools.lru_cache)
+_cache_info_sources = {}
+
+
+class RunTimings:
+    """
+    All spans and cache lookups recorded during one dashboard run
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.cache_counts = {}
+        # cache_info() counts since the process started: keep where they were, to report only this run
+        self._cache_info_start = {name: _hits_and_misses(info_function)
+                                  for name, info_function in _cache_info_sources.items()}
+
+    def add_span(self, name, parent, start, duration):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "parent": parent,
+                "start_ms": round((start - self._origin) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                "thread": threading.current_thread().name
+            })
+
+    def count_cache(self, name, hit):
+        with self._lock:
+            counts = self.cache_counts.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def totals(self):
+        """
+        Total time per span name, slowest first
+        """
+        totals = {}
+        for recorded in self.spans:
+            entry = totals.setdefault(recorded["name"], {"calls": 0, "total_ms": 0.0})
+            entry["calls"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + recorded["duration_ms"], 2)
+        return dict(sorted(totals.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+    def cache_stats(self):
+        """
+        Hit rates for counted caches and for registered cache_info() sources
+        cache_info() sources are shared by the whole process, so their numbers are the lookups
+        made since this run started (by this session, or any other running at the same time)
+        """
+        stats = {}
+        for name, counts in self.cache_counts.items():
+            stats[name] = dict(counts)
+        for name, info_function in _cache_info_sources.items():
+            hits, misses = _hits_and_misses(info_function)
+            start_hits, start_misses = self._cache_info_start.get(name, (0, 0))
+            if hits < start_hits or misses < start_misses:
+                start_hits, start_misses = 0, 0  # cache_clear() ran since: count from there
+            stats[name] = {"hits": hits - start_hits, "misses": misses - start_misses}
+        for counts in stats.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else None
+        return stats
+
+    def to_dict(self):
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "totals": self.totals(),
+            "spans": list(self.spans),
+            "caches": self.cache_stats()
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
+
+
+def _hits_and_misses(info_function):
+    info = info_function()
+    return info.hits, info.misses
+
+
+def start_run(name="dashboard"):
+    """
+    Begin measuring a new run - call once at the top of the app
+    """
+    run = RunTimings(name)
+    _current_run.set(run)
+    _current_span.set(None)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of code: `with span("parse"): ...`
+    Does nothing (apart from running the block) when no run was started
+    """
+    run = _current_run.get()
+    if run is None:
+        yield
+        return
+
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add_span(name, parent, start, time.perf_counter() - start)
+        _current_span.reset(token)
+
+
+def timed(name):
+    """
+    Decorator version of span() for whole functions
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_cache(name, hit):
+    """
+    Record one cache lookup for the current run
+    """
+    run = _current_run.get()
+    if run is not None:
+        run.count_cache(name, hit)
+
+
+def register_cache_info(name, info_function):
+    """
+    Report a cache that tracks its own statistics, e.g. an lru_cache's cache_info
+    """
+    _cache_info_sources[name] = info_function
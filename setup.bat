@@ -43,6 +43,9 @@ call .venv\Scripts\activate.bat
 python -m pip install --upgrade pip
 pip install -r requirements.txt
 
+REM Stopword list and stemmer data for the review keyword analysis (review_text.py)
+python -m nltk.downloader stopwords rslp
+
 echo.
 echo ✅ Setup complete! 🎉
 echo.
@@ -40,6 +40,9 @@ source .venv/bin/activate
 python -m pip install --upgrade pip
 pip install -r requirements.txt
 
+# Stopword list and stemmer data for the review keyword analysis (review_text.py)
+python -m nltk.downloader stopwords rslp
+
 echo ""
 echo "✅ Setup complete! 🎉"
 echo ""
@@ -0,0 +1,181 @@
+"""
+Shared on-disk cache for the review dashboard
+Several Streamlit processes can point at the same SQLite file. When an entry goes stale,
+only one process refreshes it (it takes a short "lease") while the others keep serving
+the previous value, so Play Store and Gemini are not hit once per process.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from review_timing import count_cache
+
+DEFAULT_CACHE_PATH = os.environ.get("REVIEW_CACHE_PATH", "review_cache.db")
+STALE_GRACE_SECONDS = 24 * 3600  # stale entries are still served this long after they expire
+PURGE_EVERY = 100  # writes between two clean-ups of entries past their grace period
+
+
+class SharedCache:
+    """
+    Key/value cache in SQLite with expiry times and single-flight refreshes
+    Entries still around `stale_grace_seconds` after they expired (keys nobody asks for anymore)
+    are deleted every PURGE_EVERY writes, so the file doesn't keep growing
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, lease_seconds=120, stale_grace_seconds=STALE_GRACE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.stale_grace_seconds = stale_grace_seconds
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    lease_until REAL NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # isolation_level=None lets us run BEGIN IMMEDIATE ourselves when taking a lease
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _read(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        return pickle.loads(row[0]), row[1]
+
+    def get(self, key, name=None):
+        """
+        The cached value if it is still fresh, otherwise None
+        """
+        value, expires_at = self._read(key)
+        fresh = expires_at is not None and expires_at > time.time()
+        count_cache(name or key.split(":", 1)[0], hit=fresh)
+        return value if fresh else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now + ttl, now)
+            )
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 1  # on the first write, then every PURGE_EVERY
+        if purge:
+            self.purge_expired()
+
+    def expire(self, prefix=""):
+        """
+        Mark entries as stale (they are still served until someone refreshes them,
+        or until the grace period is over)
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE entries SET expires_at = MIN(expires_at, ?) WHERE key LIKE ?",
+                         (time.time(), prefix + "%"))
+
+    def purge_expired(self):
+        """
+        Delete entries expired for longer than the grace period, and leases nobody holds anymore
+        Returns the number of entries deleted
+        """
+        now = time.time()
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM entries WHERE expires_at < ?",
+                                   (now - self.stale_grace_seconds,)).rowcount
+            conn.execute("DELETE FROM leases WHERE lease_until < ?", (now,))
+        return deleted
+
+    def _try_lease(self, key, owner):
+        """
+        Take the refresh lease for a key, unless another process holds a valid one
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT lease_until FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, lease_until) VALUES (?, ?, ?)",
+                (key, owner, now + self.lease_seconds)
+            )
+            conn.execute("COMMIT")
+            return True
+
+    def _release_lease(self, key, owner):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def get_or_compute(self, key, compute, ttl, name=None):
+        """
+        Return the cached value for `key`, calling compute() only when needed
+
+        - fresh value: returned right away
+        - stale value: whoever gets the lease recomputes, everyone else gets the old value
+        - no value yet: whoever gets the lease computes, everyone else waits for the result
+        - compute() fails: the stale value is returned if there is one within the grace period,
+          otherwise the error is raised
+        """
+        name = name or key.split(":", 1)[0]
+        owner = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex}"
+        deadline = time.time() + self.lease_seconds
+
+        while True:
+            value, expires_at = self._read(key)
+            if expires_at is not None and expires_at > time.time():
+                count_cache(name, hit=True)
+                return value
+
+            if self._try_lease(key, owner):
+                count_cache(name, hit=False)
+                try:
+                    try:
+                        value = compute()
+                    except Exception as e:
+                        if expires_at is None or expires_at < time.time() - self.stale_grace_seconds:
+                            raise
+                        # Keep showing the previous value; the next lookup tries again
+                        print(f"⚠️ Refreshing {key} failed ({e}), serving the previous value")
+                        return value
+                    self.set(key, value, ttl)
+                    return value
+                finally:
+                    self._release_lease(key, owner)
+
+            if expires_at is not None:
+                # Someone else is refreshing - the previous value is good enough for now
+                count_cache(name, hit=True)
+                return value
+
+            if time.time() > deadline:
+                # The other process seems stuck; compute it ourselves rather than wait forever
+                count_cache(name, hit=False)
+                value = compute()
+                self.set(key, value, ttl)
+                return value
+
+            time.sleep(0.2)
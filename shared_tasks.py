@@ -0,0 +1,138 @@
+"""
+One task list shared by every session of a family task manager
+All sessions read the same task objects (kept in a TaskRepository, see task_repository.py),
+and every change goes through the store, which saves it with the task storage (see task_storage.py).
+
+Each change gets a new version number. A session passes the version it last showed the user
+(seen_version) with every change: if someone else changed the same field of the same task
+since then, the change is refused with TaskConflictError instead of overwriting theirs.
+Changes to different fields of a task are merged.
+"""
+
+import threading
+
+from task_repository import TaskRepository
+
+TASK_EDIT_FIELDS = ("title", "description", "responsible", "priority", "status")
+
+
+class TaskConflictError(Exception):
+    """
+    Someone else changed or deleted the task after this session last showed it
+    """
+
+
+class SharedTaskStore:
+    """
+    Process-wide task list with a version counter and optimistic concurrency checks
+    Task dicts are never changed in place: a change replaces the task with a new dict,
+    so a session can keep reading the tasks it got while others write.
+    The returned tasks are shared with other sessions, don't change them.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self._tasks = TaskRepository(storage.load_all(), last_id=storage.last_id())
+        self._field_versions = {}  # task id -> {field: version of its last change}
+        self._replaced_at = 0
+        self.version = 0
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def find(self, status=None, priority=None, responsible=None):
+        """
+        Tasks matching every criterion given (None means any), see TaskRepository.find
+        """
+        with self._lock:
+            return self._tasks.find(status, priority, responsible)
+
+    def count(self, field=None, value=None):
+        with self._lock:
+            return self._tasks.count(field, value)
+
+    def values(self, field):
+        with self._lock:
+            return self._tasks.values(field)
+
+    def _changed(self, task_id=None, fields=()):
+        self.version += 1
+        if task_id is not None:
+            versions = self._field_versions.setdefault(task_id, {})
+            for field in fields:
+                versions[field] = self.version
+
+    def _check(self, task_id, fields, seen_version):
+        """
+        Raise TaskConflictError if one of `fields` changed after `seen_version`
+        """
+        if self._tasks.get(task_id) is None:
+            raise TaskConflictError("This task was deleted by someone else.")
+        if self._replaced_at > seen_version:
+            raise TaskConflictError("The whole task list was replaced by someone else - please try again.")
+        versions = self._field_versions.get(task_id, {})
+        changed = [field for field in fields if versions.get(field, 0) > seen_version]
+        if changed:
+            raise TaskConflictError(f"Someone else just changed this task ({', '.join(changed)}). "
+                                    "The board now shows their version - please try again.")
+
+    def add(self, fields):
+        """
+        Add a new task with the next free id and return it
+        """
+        with self._lock:
+            task = dict(fields, id=self._tasks.next_id())
+            self.storage.insert(task)
+            self._tasks.put(task)
+            self._changed(task['id'], task)
+            return task
+
+    def update(self, task_id, changes, seen_version):
+        """
+        Change some fields of a task; fields nobody else touched since seen_version are merged
+        """
+        with self._lock:
+            self._check(task_id, changes, seen_version)
+            task = {**self._tasks.get(task_id), **changes}
+            if set(changes) == {'status'}:
+                self.storage.move(task)
+            else:
+                self.storage.update(task)
+            self._tasks.put(task)
+            self._changed(task_id, changes)
+            return task
+
+    def move(self, task_id, status, seen_version):
+        return self.update(task_id, {'status': status}, seen_version)
+
+    def delete(self, task_id, seen_version):
+        """
+        Delete a task, unless someone changed it since seen_version (deleting twice is fine)
+        """
+        with self._lock:
+            if self._tasks.get(task_id) is None:
+                return
+            self._check(task_id, TASK_EDIT_FIELDS, seen_version)
+            self.storage.delete(task_id)
+            self._tasks.remove(task_id)
+            self._field_versions.pop(task_id, None)
+            self._changed()
+
+    def replace_all(self, tasks):
+        """
+        Replace every task (for "Load Example Tasks" and "Delete All Tasks")
+        """
+        with self._lock:
+            self.storage.save_all(list(tasks))
+            for task_id in [task['id'] for task in self._tasks]:
+                self._tasks.remove(task_id)
+            for task in tasks:
+                self._tasks.put(task)
+            self._field_versions = {}
+            self._changed()
+            self._replaced_at = self.version
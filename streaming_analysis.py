@@ -0,0 +1,89 @@
+"""
+Running totals for analyzing very large numbers of reviews
+Reviews are added one at a time and only counters are kept (no lists of reviews or results),
+so memory stays the same whether 1 thousand or 1 million reviews go through
+"""
+
+
+class HeavyHitters:
+    """
+    Approximate most frequent items using at most `capacity` counters (Misra-Gries sketch)
+    Any item seen more than total / (capacity + 1) times is guaranteed to be kept,
+    and its count is too low by at most that much
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+
+    def add(self, item, count=1):
+        self.total += count
+        if item in self.counters:
+            self.counters[item] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = count
+        else:
+            # No free counter: lower every counter instead, and forget the ones that reach zero
+            decrement = min(count, min(self.counters.values()))
+            self.counters = {key: value - decrement for key, value in self.counters.items() if value > decrement}
+            if count > decrement:
+                self.counters[item] = count - decrement
+
+    def top(self, n=20):
+        return sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def max_error(self):
+        """
+        How much any reported count may be below the real one
+        """
+        return self.total // (self.capacity + 1)
+
+
+class StreamingReviewStats:
+    """
+    Counts, averages, tone distribution and top keywords, updated one review at a time
+    """
+
+    def __init__(self, keyword_capacity=1000):
+        self.count = 0
+        self.rating_sum = 0
+        self.rating_counts = {}
+        self.useful_sum = 0
+        self.sentiment_count = 0
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        self.tone_counts = {}
+        self.keywords = HeavyHitters(keyword_capacity)
+
+    def add(self, review, sentiment=None, terms=()):
+        """
+        Add one review, with its sentiment result and keyword terms if there are any
+        """
+        rating = review.get('rating', 0)
+        self.count += 1
+        self.rating_sum += rating
+        self.rating_counts[rating] = self.rating_counts.get(rating, 0) + 1
+        self.useful_sum += review.get('useful_count', 0)
+
+        if sentiment:
+            self.sentiment_count += 1
+            self.polarity_sum += sentiment['polarity']
+            self.subjectivity_sum += sentiment['subjectivity']
+            self.tone_counts[sentiment['tone']] = self.tone_counts.get(sentiment['tone'], 0) + 1
+
+        for term in terms:
+            self.keywords.add(term)
+
+    def summary(self, top_n=20):
+        return {
+            "reviews": self.count,
+            "avg_rating": self.rating_sum / self.count if self.count else 0,
+            "rating_counts": dict(sorted(self.rating_counts.items(), reverse=True)),
+            "avg_useful": self.useful_sum / self.count if self.count else 0,
+            "avg_polarity": self.polarity_sum / self.sentiment_count if self.sentiment_count else 0,
+            "avg_subjectivity": self.subjectivity_sum / self.sentiment_count if self.sentiment_count else 0,
+            "tones": dict(sorted(self.tone_counts.items(), key=lambda item: item[1], reverse=True)),
+            "top_keywords": self.keywords.top(top_n),
+            "keyword_max_error": self.keywords.max_error()
+        }
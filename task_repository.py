@@ -0,0 +1,94 @@
+"""
+Tasks indexed by id, status, priority and responsible person
+Looking a task up, counting tasks in a column or filtering the board only touches the
+tasks involved, instead of going through the whole list every time
+"""
+
+INDEXED_FIELDS = ("status", "priority", "responsible")
+
+
+class TaskRepository:
+    """
+    Task dicts by id, plus one bucket per value of each indexed field
+    (e.g. status -> "Done" -> {id: task}); the size of a bucket is its count
+    """
+
+    def __init__(self, tasks=(), last_id=0):
+        """
+        last_id: highest id already given out, e.g. to tasks deleted since (see last_id() in task_storage.py)
+        """
+        self._by_id = {}
+        self._buckets = {field: {} for field in INDEXED_FIELDS}
+        self._last_id = last_id
+        for task in tasks:
+            self.put(task)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def get(self, task_id):
+        return self._by_id.get(task_id)
+
+    def next_id(self):
+        """
+        A new id, never used before (ids of deleted tasks aren't reused, even after a restart)
+        """
+        self._last_id += 1
+        return self._last_id
+
+    def put(self, task):
+        """
+        Add a task, or replace the task with the same id
+        """
+        task_id = task['id']
+        old_task = self._by_id.get(task_id)
+        self._by_id[task_id] = task
+        self._last_id = max(self._last_id, task_id)
+        for field in INDEXED_FIELDS:
+            if old_task is not None and old_task.get(field) != task.get(field):
+                self._remove_from_bucket(field, old_task)
+            self._buckets[field].setdefault(task.get(field), {})[task_id] = task
+
+    def remove(self, task_id):
+        task = self._by_id.pop(task_id, None)
+        if task is not None:
+            for field in INDEXED_FIELDS:
+                self._remove_from_bucket(field, task)
+        return task
+
+    def _remove_from_bucket(self, field, task):
+        bucket = self._buckets[field].get(task.get(field))
+        if bucket is not None:
+            bucket.pop(task['id'], None)
+            if not bucket:
+                del self._buckets[field][task.get(field)]
+
+    def count(self, field=None, value=None):
+        """
+        Number of tasks, or of tasks with `field` == `value`
+        """
+        if field is None:
+            return len(self._by_id)
+        return len(self._buckets[field].get(value, ()))
+
+    def values(self, field):
+        """
+        The different values of an indexed field (e.g. every responsible person)
+        """
+        return list(self._buckets[field])
+
+    def find(self, status=None, priority=None, responsible=None):
+        """
+        Tasks matching every criterion given (None means any)
+        Starts from the smallest matching bucket and only checks the tasks in it
+        """
+        criteria = {field: value for field, value in
+                    (("status", status), ("priority", priority), ("responsible", responsible)) if value is not None}
+        if not criteria:
+            return list(self._by_id.values())
+        field, value = min(criteria.items(), key=lambda item: self.count(*item))
+        return [task for task in self._buckets[field].get(value, {}).values()
+                if all(task.get(other) == wanted for other, wanted in criteria.items())]
@@ -0,0 +1,360 @@
+"""
+Where the family task managers keep their tasks
+Two backends with the same methods:
+- JsonTaskStorage: the original tasks.json / tasks_pt.json file plus an append-only journal,
+  so each change is one small line at the end of tasks.json.journal
+- SqliteTaskStorage: one row per task in a SQLite file (WAL mode), so adding, editing,
+  moving or deleting a task only writes that task
+
+Set TASKS_BACKEND=sqlite to use SQLite. The first time, the tasks in the JSON file are
+copied over (once); the JSON file is left untouched. To migrate by hand:
+
+    python task_storage.py tasks.json
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+TASKS_BACKEND = os.environ.get("TASKS_BACKEND", "json").lower()
+COMPACT_EVERY = 100  # journal lines before they are folded into the JSON file
+
+TASK_FIELDS = ("id", "title", "description", "responsible", "priority", "status", "created_at")
+INSERT_TASK_SQL = f"INSERT INTO tasks ({', '.join(TASK_FIELDS)}) VALUES ({', '.join('?' * len(TASK_FIELDS))})"
+
+
+class JsonTaskStorage:
+    """
+    All tasks in one JSON file (the original format) plus a journal of changes since then
+    Each change is appended to <file>.journal as one JSON line, so a crash can at most lose
+    the change being written. Every COMPACT_EVERY changes the journal is folded into a new
+    JSON file, written to a temporary file first and renamed over the old one.
+    """
+
+    def __init__(self, path, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        # False the very first time, before anything was ever saved here
+        self.existed = os.path.exists(path) or os.path.exists(self.journal_path)
+        self._lock = threading.RLock()
+        self._snapshot_hash = None
+        self._journal_entries = 0
+        self._last_id = 0  # highest id ever given out, kept in the journal header
+
+    def _read_snapshot(self):
+        """
+        Tasks in the JSON file and the hash of its content
+        A damaged file is renamed (not thrown away) and the tasks start from the journal only
+        """
+        if not os.path.exists(self.path):
+            return [], None
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        content_hash = hashlib.sha1(content).hexdigest()
+        try:
+            return json.loads(content), content_hash
+        except ValueError:
+            damaged_path = f"{self.path}.damaged-{datetime.now():%Y%m%d-%H%M%S}"
+            os.replace(self.path, damaged_path)
+            print(f"⚠️ {self.path} could not be read, kept it as {damaged_path}")
+            return None, content_hash
+
+    def _replay_journal(self, tasks_by_id, snapshot_hash):
+        """
+        Apply the journal to the tasks from the JSON file
+        Returns (changes applied, whether the journal has to be started again):
+        after a line cut short by a crash, or when the journal was written for another JSON file
+        (already folded in, or tasks.json changed since, e.g. through git) - its changes are skipped then,
+        but the ids it gave out are still remembered
+        """
+        if not os.path.exists(self.journal_path):
+            return 0, False
+        applied = 0
+        torn = False
+        matches = True
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    print(f"⚠️ Skipped an unfinished line in {self.journal_path}")
+                    torn = True
+                    continue
+                if line_number == 0:
+                    matches = event.get('op') == 'snapshot' and event.get('hash') == snapshot_hash
+                    self._last_id = max(self._last_id, event.get('last_id', 0))
+                    continue
+                if event.get('op') == 'create':
+                    self._last_id = max(self._last_id, event['task']['id'])
+                if matches:
+                    apply_event(tasks_by_id, event)
+                    applied += 1
+        return applied, torn or not matches
+
+    def load_all(self):
+        with self._lock:
+            tasks, snapshot_hash = self._read_snapshot()
+            tasks_by_id = {task['id']: task for task in tasks or []}
+            self._last_id = max([self._last_id] + list(tasks_by_id))
+            self._snapshot_hash = snapshot_hash
+            self._journal_entries, restart_journal = self._replay_journal(tasks_by_id, snapshot_hash)
+            if tasks is None or restart_journal:
+                # Damaged file, broken journal or a journal for another JSON file: start again from
+                # what could be read, so new changes go to a journal that the next load will replay
+                self._write_snapshot(list(tasks_by_id.values()))
+        return list(tasks_by_id.values())
+
+    def last_id(self):
+        """
+        The highest task id ever saved, deleted tasks included (known after load_all)
+        """
+        with self._lock:
+            return self._last_id
+
+    def _write_snapshot(self, tasks):
+        """
+        Write the JSON file atomically and start a new, empty journal for it
+        The journal header keeps the highest id given out, which the JSON file can't
+        (the task that had it may be deleted), so ids are never reused
+        """
+        content = json.dumps(tasks, indent=2).encode('utf-8')
+        _write_atomically(self.path, content)
+        self._snapshot_hash = hashlib.sha1(content).hexdigest()
+        self._last_id = max([self._last_id] + [task['id'] for task in tasks])
+        header = json.dumps({'op': 'snapshot', 'hash': self._snapshot_hash, 'last_id': self._last_id}) + "\n"
+        _write_atomically(self.journal_path, header.encode('utf-8'))
+        self._journal_entries = 0
+
+    def save_all(self, tasks):
+        with self._lock:
+            self._write_snapshot(tasks)
+
+    def compact(self):
+        """
+        Fold the journal into the JSON file
+        """
+        with self._lock:
+            self._write_snapshot(self.load_all())
+
+    def _append(self, event):
+        with self._lock:
+            if not os.path.exists(self.journal_path):
+                # First change since the JSON file was written: start a journal that belongs to it
+                self.compact()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_entries += 1
+            if self._journal_entries >= self.compact_every:
+                self.compact()
+
+    def insert(self, task):
+        with self._lock:
+            self._append({'op': 'create', 'task': task})
+            self._last_id = max(self._last_id, task['id'])
+
+    def update(self, task):
+        self._append({'op': 'update', 'task': task})
+
+    def move(self, task):
+        self._append({'op': 'move', 'id': task['id'], 'status': task['status']})
+
+    def delete(self, task_id):
+        self._append({'op': 'delete', 'id': task_id})
+
+
+def apply_event(tasks_by_id, event):
+    """
+    Apply one journal change to {id: task}; applying the same change twice does no harm
+    """
+    op = event.get('op')
+    if op in ('create', 'update'):
+        tasks_by_id[event['task']['id']] = event['task']
+    elif op == 'move' and event['id'] in tasks_by_id:
+        tasks_by_id[event['id']]['status'] = event['status']
+    elif op == 'delete':
+        tasks_by_id.pop(event['id'], None)
+
+
+def _write_atomically(path, content):
+    """
+    Write to a temporary file next to `path` and rename it over `path`
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class SqliteTaskStorage:
+    """
+    One row per task, indexed on status, priority and responsible
+    A new connection is opened for each call, so the storage can be shared between sessions
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # False the very first time, before anything was ever saved here
+        self.existed = os.path.exists(path)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL DEFAULT '',
+                    responsible TEXT NOT NULL DEFAULT '',
+                    priority TEXT NOT NULL DEFAULT 'Low',
+                    status TEXT NOT NULL DEFAULT 'Open',
+                    created_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+                CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks (priority);
+                CREATE INDEX IF NOT EXISTS idx_tasks_responsible ON tasks (responsible);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        One write transaction that takes the write lock before its first read (BEGIN IMMEDIATE),
+        so two processes never both act on what they read before the other one wrote
+        """
+        with self._connect() as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _row(task):
+        return (task['id'], task.get('title', ''), task.get('description', ''), task.get('responsible', ''),
+                task.get('priority', 'Low'), task.get('status', 'Open'), task.get('created_at'))
+
+    def load_all(self):
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {', '.join(TASK_FIELDS)} FROM tasks ORDER BY id").fetchall()
+        return [dict(zip(TASK_FIELDS, row)) for row in rows]
+
+    def last_id(self):
+        """
+        The highest task id ever saved, deleted tasks included (kept in the meta table)
+        """
+        with self._connect() as conn:
+            row = conn.execute("""SELECT MAX(COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'last_id'), 0),
+                                             COALESCE((SELECT MAX(id) FROM tasks), 0))""").fetchone()
+        return row[0]
+
+    @staticmethod
+    def _remember_last_id(conn, task_id):
+        conn.execute(
+            """INSERT INTO meta (key, value) VALUES ('last_id', ?)
+               ON CONFLICT (key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))""",
+            (task_id,)
+        )
+
+    def save_all(self, tasks):
+        """
+        Replace every task (used for "Load Example Tasks" and "Delete All Tasks")
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.executemany(INSERT_TASK_SQL, [self._row(task) for task in tasks])
+            if tasks:
+                self._remember_last_id(conn, max(task['id'] for task in tasks))
+
+    def insert(self, task):
+        with self._connect() as conn:
+            conn.execute(INSERT_TASK_SQL, self._row(task))
+            self._remember_last_id(conn, task['id'])
+
+    def update(self, task):
+        assignments = ", ".join(f"{field} = ?" for field in TASK_FIELDS[1:])
+        with self._connect() as conn:
+            conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", self._row(task)[1:] + (task['id'],))
+
+    def move(self, task):
+        with self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (task['status'], task['id']))
+
+    def delete(self, task_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def migrate_from_json(self, json_path):
+        """
+        Copy the tasks of a JSON task file into this database, only the first time
+        Returns the number of tasks copied (0 if it was already done or there is no file)
+        The check and the copy are one transaction, so two apps starting at once copy the tasks only once
+        """
+        with self._transaction() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+            if done or not os.path.exists(json_path):
+                return 0
+            json_storage = JsonTaskStorage(json_path)
+            tasks = json_storage.load_all()
+            conn.executemany(INSERT_TASK_SQL.replace("INSERT", "INSERT OR IGNORE"),
+                             [self._row(task) for task in tasks])
+            self._remember_last_id(conn, json_storage.last_id())
+            conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,))
+        return len(tasks)
+
+
+def sqlite_path_for(json_path):
+    """
+    tasks.json -> tasks.db, tasks_pt.json -> tasks_pt.db
+    """
+    return os.path.splitext(json_path)[0] + ".db"
+
+
+def open_task_storage(json_path, backend=None):
+    """
+    The storage chosen with TASKS_BACKEND for an app that used to save to `json_path`
+    """
+    backend = (backend or TASKS_BACKEND).lower()
+    if backend == "sqlite":
+        storage = SqliteTaskStorage(sqlite_path_for(json_path))
+        storage.migrate_from_json(json_path)
+        # Tasks saved in the JSON file before the switch count as saved tasks
+        storage.existed = storage.existed or os.path.exists(json_path)
+        return storage
+    return JsonTaskStorage(json_path)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:] or ["tasks.json", "tasks_pt.json"]:
+        storage = SqliteTaskStorage(sqlite_path_for(path))
+        copied = storage.migrate_from_json(path)
+        print(f"✅ {path} -> {storage.path}: {copied} tasks copied")
@@ -0,0 +1,42 @@
+"""
+Tests for reading Play Store reviews with the extraction schema (run with: python -m pytest)
+"""
+
+from bs4 import BeautifulSoup
+
+from app_review_scraper import PLAY_STORE_REVIEW_SCHEMA
+
+
+def extract(html):
+    records, _ = PLAY_STORE_REVIEW_SCHEMA.extract(BeautifulSoup(html, "html.parser"))
+    return records
+
+
+def review_html(header):
+    return f"""
+    <div class="EGFGHd">
+      <div class="X5PpBb">Ana Silva</div>
+      <div class="Jx4nYe">{header}<span class="bp9Aid">12 de março de 2025</span></div>
+      <div class="h3YV2d">A app funciona bem para pagar portagens.</div>
+      <div class="AJTPZc">3 pessoas acharam esta avaliação útil</div>
+    </div>
+    """
+
+
+def test_rating_from_the_stars_label():
+    [review] = extract(review_html('<div aria-label="Classificação: 4 estrelas de cinco"></div>'))
+    assert review["rating"] == 4
+    assert review["reviewer_name"] == "Ana Silva"
+    assert review["date"] == "12 de março de 2025"
+
+
+def test_rating_skips_star_labels_without_a_number():
+    header = ('<span aria-label="Mais estrelas"></span>'
+              '<div aria-label="Classificação: 2 estrelas de cinco"></div>')
+    [review] = extract(review_html(header))
+    assert review["rating"] == 2
+
+
+def test_rating_defaults_to_five_without_any_number():
+    [review] = extract(review_html('<span aria-label="Mais estrelas"></span>'))
+    assert review["rating"] == 5
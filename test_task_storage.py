@@ -0,0 +1,64 @@
+"""
+Tests for the JSON task storage journal (run with: python -m pytest)
+"""
+
+import json
+
+from shared_tasks import SharedTaskStore
+from task_storage import JsonTaskStorage
+
+
+def open_store(path):
+    return SharedTaskStore(JsonTaskStorage(str(path)))
+
+
+def test_changes_survive_a_restart(tmp_path):
+    path = tmp_path / "tasks.json"
+    store = open_store(path)
+    first = store.add({"title": "Lavar a loiça", "status": "Open"})
+    store.move(first["id"], "Done", store.version)
+
+    store = open_store(path)
+    assert [(task["id"], task["status"]) for task in store.find()] == [(1, "Done")]
+
+
+def test_journal_for_another_tasks_file_is_restarted(tmp_path):
+    """
+    tasks.json changed behind the app's back (e.g. git checkout): the old journal no longer matches,
+    and the changes made after that must not be written under its header and lost on the next restart
+    """
+    path = tmp_path / "tasks.json"
+    store = open_store(path)
+    for title in ("a", "b", "c"):
+        store.add({"title": title, "status": "Open"})
+    store.delete(3, store.version)
+
+    path.write_text(json.dumps([{"id": 1, "title": "a", "status": "Open"}]), encoding="utf-8")
+
+    store = open_store(path)
+    added = store.add({"title": "d", "status": "Open"})
+    store.move(1, "Done", store.version)
+    assert added["id"] == 4  # ids given out before the change are still not reused
+
+    store = open_store(path)
+    assert [(task["id"], task["status"]) for task in store.find()] == [(1, "Done"), (4, "Open")]
+    assert store.add({"title": "e"})["id"] == 5
+
+
+def test_crash_between_snapshot_and_journal_header(tmp_path):
+    """
+    The new tasks.json was written but the app stopped before its journal header was:
+    the old journal (already folded in) is skipped and a new one is started
+    """
+    path = tmp_path / "tasks.json"
+    store = open_store(path)
+    store.add({"title": "a", "status": "Open"})
+    old_journal = (tmp_path / "tasks.json.journal").read_text(encoding="utf-8")
+    store.storage.compact()
+    (tmp_path / "tasks.json.journal").write_text(old_journal, encoding="utf-8")
+
+    store = open_store(path)
+    store.add({"title": "b", "status": "Open"})
+
+    store = open_store(path)
+    assert [task["title"] for task in store.find()] == ["a", "b"]